@@ -1,3 +1,4 @@
+from collections import OrderedDict
 from datetime import date
 from fastapi import (
   HTTPException, 
@@ -11,26 +12,22 @@ from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 from typing import Optional
 from jose import JWTError, jwt
-from arango import ArangoClient
 from dotenv import load_dotenv
+import hashlib
 import os
+import time
 
 load_dotenv()
 
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "10080"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# Tokens issued before exp was added never expire, re-verify them from time to time
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def return_db_instance(): 
-  client = ArangoClient()
-  db = client.db(
-        os.getenv("ARANGODB_DATABASE"),
-        username=os.getenv("ARANGODB_USERNAME"),
-        password=os.getenv("ARANGODB_PASSWORD"),
-    )
-  return db
-
 class User(BaseModel):
     email: str
     password: str
@@ -59,11 +56,89 @@ class Token(BaseModel):
 class GeolocationArgs(BaseModel):
     ip_signup: str
 
+class TokenClaims:
+    """Verified JWT claims. Supports ``claims.get(...)``/``claims[...]`` like the payload dict."""
+
+    __slots__ = (
+        "user_id",
+        "email",
+        "first_name",
+        "last_name",
+        "department",
+        "province",
+        "district",
+        "ip_signup",
+        "iat",
+        "exp",
+    )
+
+    def __init__(self, payload: dict):
+        for name in self.__slots__:
+            setattr(self, name, payload.get(name))
+
+    def get(self, key: str, default=None):
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def __getitem__(self, key: str):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class VerifiedTokenCache:
+    """
+    LRU of already verified tokens keyed by the token's SHA-256 digest. An
+    entry is never served past the token's ``exp``.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[bytes, tuple[TokenClaims, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: bytes) -> Optional[TokenClaims]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+        claims, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[digest]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return claims
+
+    def set(self, digest: bytes, claims: TokenClaims):
+        expires_at = claims.exp if claims.exp is not None else time.time() + self.ttl
+        self._entries[digest] = (claims, expires_at)
+        self._entries.move_to_end(digest)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+token_cache = VerifiedTokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+
 def create_access_token(data: dict):
     to_encode = data.copy()
+    issued_at = int(time.time())
+    to_encode.update({"iat": issued_at, "exp": issued_at + ACCESS_TOKEN_EXPIRE_MINUTES * 60})
     return jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=ALGORITHM)
 
-def verify_token(token: str):
+def verify_token(token: str) -> TokenClaims:
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    claims = token_cache.get(digest)
+    if claims is not None:
+        return claims
+
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("user_id")
@@ -73,15 +148,18 @@ def verify_token(token: str):
                 detail="Token inválido o expirado",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        return payload  
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido o expirado",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    claims = TokenClaims(payload)
+    token_cache.set(digest, claims)
+    return claims
     
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> TokenClaims:
     return verify_token(token) 
 
 #from google.cloud import secretmanager
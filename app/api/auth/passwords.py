@@ -0,0 +1,103 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from passlib.context import CryptContext
+
+from app.api.metrics import span
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies bcrypt passwords on a dedicated, bounded thread pool.
+
+    bcrypt releases the GIL while it computes a hash, so worker threads give
+    real parallelism without the event loop ever running the hash itself.
+    Once ``workers + queue_limit`` operations are pending, new ones are
+    rejected with a 503 instead of piling up behind a login burst.
+
+    Hashes whose cost differs from ``rounds`` are reported by
+    ``verify_and_update`` so callers can store the rehashed value.
+    """
+
+    def __init__(
+        self,
+        rounds: Optional[int] = None,
+        workers: Optional[int] = None,
+        queue_limit: Optional[int] = None,
+    ):
+        self.rounds = rounds or int(os.getenv("BCRYPT_ROUNDS", "12"))
+        self.workers = workers or int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+        if queue_limit is None:
+            queue_limit = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "32"))
+        self.queue_limit = queue_limit
+
+        self.context = CryptContext(
+            schemes=["bcrypt"],
+            bcrypt__rounds=self.rounds,
+            bcrypt__min_rounds=self.rounds,
+            bcrypt__max_rounds=self.rounds,
+        )
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+        self._completed = 0
+
+    async def _submit(self, fn: Callable[..., Any], *args) -> Any:
+        with self._lock:
+            if self._pending >= self.workers + self.queue_limit:
+                self._rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="El servicio está ocupado, inténtalo nuevamente en unos segundos",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+
+        try:
+            future = self._executor.submit(partial(fn, *args))
+        except BaseException:
+            self._release(None)
+            raise
+        # The slot is only freed once the thread is done with it: cancelling
+        # the awaiting coroutine drops a hash still in the queue, but one that
+        # already started keeps its worker until bcrypt returns
+        future.add_done_callback(self._release)
+        with span("bcrypt", fn.__name__):
+            return await asyncio.wrap_future(future)
+
+    def _release(self, future: Optional[Future]):
+        with self._lock:
+            self._pending -= 1
+            if future is not None and not future.cancelled():
+                self._completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Returns whether the password matches and, if so, a new hash when the stored one is outdated."""
+        return await self._submit(self.context.verify_and_update, password, hashed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rounds": self.rounds,
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "pending": self._pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+def get_password_hasher(request: Request) -> PasswordHasher:
+    return request.app.state.password_hasher
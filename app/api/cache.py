@@ -0,0 +1,269 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Union
+
+from app.api.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# A fixed TTL in seconds, or a function of the loaded value (e.g. shorter for
+# negative results)
+Ttl = Union[float, Callable[[Any], float], None]
+
+
+def cache_key(namespace: str, *parts: Any) -> str:
+    """
+    Builds a content-addressed key from JSON-serializable parts.
+
+    Strings are normalized (trimmed, lower-cased, inner whitespace collapsed)
+    so trivially different spellings of the same input share an entry.
+    """
+    def normalize(value):
+        if isinstance(value, str):
+            return " ".join(value.split()).lower()
+        if isinstance(value, dict):
+            return {k: normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        return value
+
+    payload = json.dumps([normalize(part) for part in parts], sort_keys=True, ensure_ascii=False, default=str)
+    return f"{namespace}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+class CacheBackend:
+    """Interface for shared cache tiers (e.g. a store reachable by every instance)."""
+
+    async def get(self, key: str) -> Optional[tuple[Any, float]]:
+        """Returns ``(value, expires_at)`` or None."""
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, expires_at: float):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+
+class LRUCache:
+    """In-process TTL cache with LRU eviction."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+
+    def get_entry(self, key: str) -> Optional[tuple[Any, float]]:
+        """Returns ``(value, expires_at)`` even if the entry is already stale."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.get_entry(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, expires_at: Optional[float] = None):
+        if expires_at is None:
+            expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ResponseCache:
+    """
+    Two-tier response cache with single-flight de-duplication.
+
+    Lookups go to the in-process LRU first and then to the optional shared
+    ``backend``. On a miss, concurrent callers for the same key share one
+    in-flight ``loader`` call instead of each starting their own.
+
+    With ``stale_ttl`` set, ``get_stale_while_revalidate`` keeps serving an
+    expired entry for that many extra seconds while a background task
+    refreshes it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 1024,
+        ttl: float = 3600,
+        stale_ttl: float = 0,
+        backend: Optional[CacheBackend] = None,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.local = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.backend = backend
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._waiters: dict[asyncio.Task, int] = {}
+        self._background: set[asyncio.Task] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.backend_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.cancelled = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        if self.backend is not None:
+            entry = await self.backend.get(key)
+            if entry is not None and entry[1] > time.time():
+                self.backend_hits += 1
+                self.local.set(key, entry[0], expires_at=entry[1])
+                return entry[0]
+        return None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self.local.set(key, value, expires_at=expires_at)
+        if self.backend is not None:
+            await self.backend.set(key, value, expires_at)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Ttl) -> Any:
+        try:
+            value = await loader()
+        except Exception:
+            self.errors += 1
+            raise
+        await self.set(key, value, ttl(value) if callable(ttl) else ttl)
+        return value
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        self._background.discard(task)
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter went away
+            task.exception()
+
+    def _start_load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Ttl) -> asyncio.Task:
+        task = asyncio.ensure_future(self._load(key, loader, ttl))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._done(key, t))
+        return task
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Ttl = None,
+        cancel_abandoned: bool = False,
+    ) -> Any:
+        """
+        Returns the cached value for ``key`` or loads it once for all
+        concurrent callers.
+
+        The load runs as its own task, so a caller that goes away does not
+        cancel the result other callers are waiting for. With
+        ``cancel_abandoned`` a cancelled caller that was the last one waiting
+        cancels the load too, and only returns once it has stopped; background
+        refreshes are never cancelled this way.
+        """
+        value = await self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = self._start_load(key, loader, ttl)
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if cancel_abandoned and self._waiters[task] == 1 and task not in self._background and not task.done():
+                self.cancelled += 1
+                task.cancel()
+                await asyncio.wait({task})
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def _log_refresh(self, key: str, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Falló la actualización en segundo plano de {self.name} ({key}): {task.exception()!r}")
+
+    def refresh(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Ttl = None) -> asyncio.Task:
+        """Reloads ``key`` in the background unless a load is already running."""
+        task = self._inflight.get(key)
+        if task is None:
+            self.refreshes += 1
+            task = self._start_load(key, loader, ttl)
+            self._background.add(task)
+            # Nobody may be awaiting a background refresh, so its failure is logged here
+            task.add_done_callback(lambda t: self._log_refresh(key, t))
+        return task
+
+    async def get_stale_while_revalidate(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Ttl = None,
+        cancel_abandoned: bool = False,
+    ) -> Any:
+        entry = self.local.get_entry(key)
+        if entry is None and self.backend is not None:
+            entry = await self.backend.get(key)
+            if entry is not None:
+                self.backend_hits += 1
+                self.local.set(key, entry[0], expires_at=entry[1])
+
+        if entry is not None:
+            value, expires_at = entry
+            now = time.time()
+            if expires_at > now:
+                self.hits += 1
+                return value
+            if expires_at + self.stale_ttl > now:
+                self.stale_hits += 1
+                self.refresh(key, loader, ttl)
+                return value
+
+        return await self.get_or_load(key, loader, ttl, cancel_abandoned)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+        return {
+            "entries": len(self.local),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "refreshes": self.refreshes,
+            "backend_hits": self.backend_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "inflight": len(self._inflight),
+            "hit_rate": round((self.hits + self.stale_hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
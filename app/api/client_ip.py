@@ -0,0 +1,41 @@
+import ipaddress
+import os
+
+from fastapi import Request
+
+# Loopback, the App Engine front end and Google load balancers
+DEFAULT_TRUSTED_PROXIES = "127.0.0.1/32,::1/128,169.254.0.0/16,35.191.0.0/16,130.211.0.0/22"
+
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(network.strip(), strict=False)
+    for network in os.getenv("TRUSTED_PROXIES", DEFAULT_TRUSTED_PROXIES).split(",")
+    if network.strip()
+]
+
+
+def _is_trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def client_ip(request: Request) -> str:
+    """
+    Returns the address of the client that made the request.
+
+    ``X-Forwarded-For`` is only honoured when the request came through a
+    trusted proxy, and is walked right to left so a client cannot spoof its
+    address by sending the header itself.
+    """
+    peer = request.client.host if request.client else None
+    if peer is None or not _is_trusted(peer):
+        return peer or "No disponible"
+
+    forwarded = request.headers.get("x-forwarded-for", "")
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted(hop):
+            return hop
+    return hops[0] if hops else peer
@@ -0,0 +1,61 @@
+import hashlib
+import time
+from typing import Any, Optional
+
+from app.api.cache import CacheBackend
+from app.api.db.connection import ArangoConnectionManager
+from app.api.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+CACHE_COLLECTION = "response_cache"
+
+
+class ArangoCacheBackend(CacheBackend):
+    """
+    Shared, persistent cache tier stored in the ``response_cache`` collection.
+
+    Entries survive restarts and are visible to every instance. A TTL index on
+    ``purge_at`` lets ArangoDB delete them ``retention`` seconds after they
+    expire, so stale values remain available for stale-while-revalidate.
+    Backend failures are logged and treated as misses.
+    """
+
+    def __init__(self, manager: ArangoConnectionManager, retention: float = 0):
+        self.manager = manager
+        self.retention = retention
+        self.collection = manager.db.collection(CACHE_COLLECTION)
+
+    @staticmethod
+    def _key(key: str) -> str:
+        # Document keys are limited in length and characters, hash them
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[tuple[Any, float]]:
+        try:
+            document = await self.manager.executor.run(self.collection.get, self._key(key))
+        except Exception as e:
+            logger.error(f"Error al leer la caché compartida: {e}")
+            return None
+        if document is None:
+            return None
+        return document["value"], document["expires_at"]
+
+    async def set(self, key: str, value: Any, expires_at: float):
+        document = {
+            "_key": self._key(key),
+            "value": value,
+            "expires_at": expires_at,
+            "purge_at": expires_at + self.retention,
+            "updated_at": time.time(),
+        }
+        try:
+            await self.manager.executor.run(self.collection.insert, document, overwrite_mode="replace", silent=True)
+        except Exception as e:
+            logger.error(f"Error al escribir en la caché compartida: {e}")
+
+    async def delete(self, key: str):
+        try:
+            await self.manager.executor.run(self.collection.delete, self._key(key), ignore_missing=True)
+        except Exception as e:
+            logger.error(f"Error al borrar de la caché compartida: {e}")
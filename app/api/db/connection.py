@@ -0,0 +1,212 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from arango import ArangoClient
+from arango.database import StandardDatabase
+from arango.http import DefaultHTTPClient
+from fastapi import Request
+from requests import Session
+
+from app.api.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def _arango_hosts() -> str:
+    host = os.getenv("ARANGODB_HOST") or "127.0.0.1"
+    port = os.getenv("ARANGODB_PORT") or "8529"
+    if host.startswith("http://") or host.startswith("https://"):
+        return host
+    return f"http://{host}:{port}"
+
+
+class PooledHTTPClient(DefaultHTTPClient):
+    """
+    HTTP client for python-arango backed by a single keep-alive connection pool.
+
+    Every request first acquires a slot of a bounded semaphore sized like the
+    pool, which lets us report how many connections are in use and how long
+    callers waited for one.
+    """
+
+    def __init__(self, pool_size: int, pool_timeout: Optional[float], request_timeout: float):
+        super().__init__(
+            request_timeout=request_timeout,
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            pool_timeout=pool_timeout,
+        )
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._lock = threading.Lock()
+        self._sessions: list[Session] = []
+        self._in_use = 0
+        self._waiting = 0
+        self._requests = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def create_session(self, host: str) -> Session:
+        session = super().create_session(host)
+        # Keep-alive is the requests default, make it explicit for proxies
+        session.headers["Connection"] = "keep-alive"
+        self._sessions.append(session)
+        return session
+
+    def send_request(self, session, method, url, headers=None, params=None, data=None, auth=None):
+        started = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+        acquired = self._slots.acquire(timeout=self.pool_timeout)
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._waiting -= 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            if not acquired:
+                self._timeouts += 1
+            else:
+                self._in_use += 1
+                self._requests += 1
+        if not acquired:
+            raise TimeoutError(f"No ArangoDB connection available after {waited:.3f}s")
+
+        try:
+            return super().send_request(session, method, url, headers, params, data, auth)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def _idle_connections(self) -> int:
+        # http:// and https:// are mounted on the same adapter, count it once
+        adapters = {id(a): a for s in self._sessions for a in s.adapters.values()}
+        idle = 0
+        for adapter in adapters.values():
+            poolmanager = getattr(adapter, "poolmanager", None)
+            if poolmanager is None:
+                continue
+            for key in list(poolmanager.pools.keys()):
+                pool = poolmanager.pools.get(key)
+                if pool is None or pool.pool is None:
+                    continue
+                idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+        return idle
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self._requests
+            return {
+                "pool_size": self.pool_size,
+                "in_use": self._in_use,
+                "idle": self._idle_connections(),
+                "waiting": self._waiting,
+                "requests": requests,
+                "acquire_timeouts": self._timeouts,
+                "wait_time_total_ms": round(self._wait_total * 1000, 3),
+                "wait_time_avg_ms": round(self._wait_total * 1000 / requests, 3) if requests else 0.0,
+                "wait_time_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+
+class DatabaseExecutor:
+    """
+    Runs blocking python-arango calls on a bounded thread pool so they never
+    stall the event loop.
+
+    The pool has as many workers as the Arango connection pool has
+    connections, so an offloaded call never queues twice.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="arango")
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+class ArangoConnectionManager:
+    """
+    Owns the ArangoDB client for the lifetime of the application.
+
+    Created once in the ``lifespan`` hook and shared across requests through the
+    ``get_db_manager`` dependency and the repositories, which offload their
+    calls to ``executor``.
+    """
+
+    def __init__(
+        self,
+        hosts: Optional[str] = None,
+        database: Optional[str] = None,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        pool_timeout: Optional[float] = None,
+        request_timeout: Optional[float] = None,
+    ):
+        self.hosts = hosts or _arango_hosts()
+        self.database = database or os.getenv("ARANGODB_DATABASE")
+        self.pool_size = pool_size or int(os.getenv("ARANGODB_POOL_SIZE", "10"))
+        if pool_timeout is None:
+            pool_timeout = float(os.getenv("ARANGODB_POOL_TIMEOUT", "5"))
+        if request_timeout is None:
+            request_timeout = float(os.getenv("ARANGODB_REQUEST_TIMEOUT", "30"))
+
+        self.http_client = PooledHTTPClient(self.pool_size, pool_timeout, request_timeout)
+        self.client = ArangoClient(hosts=self.hosts, http_client=self.http_client)
+        self.db: StandardDatabase = self.client.db(
+            self.database,
+            username=username or os.getenv("ARANGODB_USERNAME"),
+            password=password or os.getenv("ARANGODB_PASSWORD"),
+        )
+        self.executor = DatabaseExecutor(self.pool_size)
+        # Names of the indexes ensure_schema has confirmed, see app.api.db.schema
+        self.verified_indexes: set[str] = set()
+        self._closed = False
+
+    def health(self) -> dict:
+        started = time.perf_counter()
+        try:
+            version = self.db.version()
+            status = "ok"
+            error = None
+        except Exception as e:
+            version = None
+            status = "error"
+            error = str(e)
+        result = {
+            "status": status,
+            "version": version,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 3),
+            "pool": self.stats(),
+        }
+        if error:
+            result["error"] = error
+        return result
+
+    def stats(self) -> dict:
+        return self.http_client.stats()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.executor.shutdown()
+        self.client.close()
+        logger.info("Conexiones con ArangoDB cerradas")
+
+
+def get_db_manager(request: Request) -> ArangoConnectionManager:
+    return request.app.state.arango
@@ -0,0 +1,57 @@
+import hashlib
+import time
+
+from app.api.db.connection import ArangoConnectionManager
+from app.api.logger import setup_logger
+from app.api.rate_limit import RateLimit, RateLimitBackend
+
+logger = setup_logger(__name__)
+
+RATE_LIMIT_COLLECTION = "rate_limits"
+
+# Refill and take one token in a single exclusive write, so concurrent
+# requests from every instance see a consistent bucket
+CONSUME_QUERY = """
+LET bucket = DOCUMENT(CONCAT(@collection_name, "/", @key))
+LET available = bucket == null ? @burst : MIN([@burst, bucket.tokens + (@now - bucket.updated_at) * @rate])
+LET allowed = available >= 1
+LET tokens = allowed ? available - 1 : available
+UPSERT { _key: @key }
+    INSERT { _key: @key, tokens: tokens, updated_at: @now, purge_at: @purge_at }
+    UPDATE { tokens: tokens, updated_at: @now, purge_at: @purge_at }
+    IN @@collection OPTIONS { exclusive: true }
+RETURN allowed ? 0 : (1 - tokens) / @rate
+"""
+
+
+class ArangoRateLimitBackend(RateLimitBackend):
+    """
+    Token buckets in the ``rate_limits`` collection, shared by every instance.
+
+    A TTL index on ``purge_at`` drops buckets once they would be full again.
+    If ArangoDB is unavailable requests are let through.
+    """
+
+    def __init__(self, manager: ArangoConnectionManager):
+        self.manager = manager
+
+    def _consume(self, key: str, limit: RateLimit) -> float:
+        now = time.time()
+        cursor = self.manager.db.aql.execute(CONSUME_QUERY, bind_vars={
+            "@collection": RATE_LIMIT_COLLECTION,
+            "collection_name": RATE_LIMIT_COLLECTION,
+            # Document keys are limited in length and characters, hash them
+            "key": hashlib.sha256(key.encode("utf-8")).hexdigest(),
+            "burst": limit.burst,
+            "rate": limit.rate,
+            "now": now,
+            "purge_at": now + limit.burst / limit.rate,
+        })
+        return next(cursor)
+
+    async def consume(self, key: str, limit: RateLimit) -> float:
+        try:
+            return await self.manager.executor.run(self._consume, key, limit)
+        except Exception as e:
+            logger.error(f"Error al consultar el límite de solicitudes compartido: {e}")
+            return 0.0
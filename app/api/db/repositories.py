@@ -0,0 +1,263 @@
+from typing import Any, Callable, Optional
+
+from arango.exceptions import DocumentInsertError
+from fastapi import Request
+
+from app.api.db.connection import ArangoConnectionManager
+from app.api.db.schema import UNIQUE_USER_INDEXES
+from app.api.metrics import span
+
+
+class Repository:
+    def __init__(self, manager: ArangoConnectionManager):
+        self.manager = manager
+        self.db = manager.db
+
+    async def _run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        # Queries are closures named after the repository method that built them
+        operation = fn.__qualname__.split(".<locals>")[0] if ".<locals>" in fn.__qualname__ else f"{type(self).__name__}.{fn.__name__}"
+        with span("db", operation):
+            return await self.manager.executor.run(fn, *args, **kwargs)
+
+
+# Error raised by ArangoDB when a write breaks a unique index
+UNIQUE_CONSTRAINT_VIOLATED = 1210
+
+
+class DuplicateUserError(Exception):
+    def __init__(self, field: str):
+        super().__init__(f"Ya existe un usuario con ese {field}")
+        self.field = field
+
+
+class UserRepository(Repository):
+    collection = "users"
+
+    async def find_by_email(self, email: str) -> Optional[dict]:
+        """Looks the user up through the unique email index, returning only the fields login needs."""
+        def query():
+            cursor = self.db.aql.execute(
+                """
+                FOR user IN users
+                    FILTER user.email == @email
+                    LIMIT 1
+                    RETURN KEEP(user, "_key", "email", "password", "firstName", "lastName",
+                                "department", "province", "district", "ipSignup")
+                """,
+                bind_vars={"email": email}
+            )
+            return next(cursor, None)
+
+        return await self._run(query)
+
+    async def find_duplicate(self, email: str, dni: str) -> Optional[str]:
+        """Returns ``"email"`` or ``"dni"`` if a user already has that value, else None."""
+        def query():
+            cursor = self.db.aql.execute(
+                """
+                FOR user IN users
+                    FILTER user.email == @email OR user.dni == @dni
+                    LIMIT 1
+                    RETURN user.email == @email ? "email" : "dni"
+                """,
+                bind_vars={"email": email, "dni": dni}
+            )
+            return next(cursor, None)
+
+        return await self._run(query)
+
+    async def insert(self, user: dict) -> dict:
+        """
+        Inserts ``user``, raising DuplicateUserError when the email or DNI is
+        already registered.
+
+        Duplicates are normally rejected by the unique indexes. Until
+        ensure_schema has confirmed both, they are looked up first instead.
+        """
+        if not UNIQUE_USER_INDEXES <= self.manager.verified_indexes:
+            field = await self.find_duplicate(user["email"], user["dni"])
+            if field is not None:
+                raise DuplicateUserError(field)
+        try:
+            return await self._run(self.db[self.collection].insert, user, silent=True)
+        except DocumentInsertError as e:
+            if e.error_code != UNIQUE_CONSTRAINT_VIOLATED:
+                raise
+            message = e.error_message or ""
+            raise DuplicateUserError("dni" if "idx_users_dni" in message or "'dni'" in message else "email")
+
+    async def update_password(self, key: str, hashed_password: str) -> dict:
+        return await self._run(self.db[self.collection].update, {"_key": key, "password": hashed_password})
+
+
+class MessageRepository(Repository):
+    collection = "messages"
+
+    async def insert_next(self, message: dict) -> dict:
+        """
+        Stores ``message`` with the next ``order`` of its district in one
+        round-trip.
+
+        The per-district counter lives in ``message_counters`` and is bumped
+        with an exclusive UPSERT in the same AQL transaction as the insert, so
+        concurrent posts never get the same order. A district without a
+        counter starts after its current highest order.
+        """
+        def query():
+            cursor = self.db.aql.execute(
+                """
+                LET counter = FIRST(
+                    UPSERT { district: @district }
+                    INSERT {
+                        district: @district,
+                        value: (FIRST(
+                            FOR msg IN messages
+                                FILTER msg.district == @district
+                                SORT msg.order DESC
+                                LIMIT 1
+                                RETURN msg.order
+                        ) || 0) + 1
+                    }
+                    UPDATE { value: OLD.value + 1 }
+                    IN message_counters OPTIONS { exclusive: true }
+                    RETURN NEW.value
+                )
+                INSERT MERGE(@message, { order: counter }) INTO messages
+                RETURN NEW
+                """,
+                bind_vars={"district": message["district"], "message": message}
+            )
+            return next(cursor)
+
+        return await self._run(query)
+
+    async def reserve_orders(self, counts: dict[str, int]) -> dict[str, int]:
+        """
+        Reserves ``count`` consecutive orders per district in one query and
+        returns the first reserved order of each district.
+        """
+        def query():
+            cursor = self.db.aql.execute(
+                """
+                FOR reservation IN @reservations
+                    UPSERT { district: reservation.district }
+                    INSERT {
+                        district: reservation.district,
+                        value: (FIRST(
+                            FOR msg IN messages
+                                FILTER msg.district == reservation.district
+                                SORT msg.order DESC
+                                LIMIT 1
+                                RETURN msg.order
+                        ) || 0) + reservation.count
+                    }
+                    UPDATE { value: OLD.value + reservation.count }
+                    IN message_counters OPTIONS { exclusive: true }
+                    RETURN { district: reservation.district, first: NEW.value - reservation.count + 1 }
+                """,
+                bind_vars={"reservations": [{"district": d, "count": c} for d, c in counts.items()]}
+            )
+            return {row["district"]: row["first"] for row in cursor}
+
+        return await self._run(query)
+
+    async def insert_many(self, messages: list[dict]) -> list[Any]:
+        """Inserts ``messages`` in one request; each result is the stored metadata or the error for that item."""
+        return await self._run(self.db.collection(self.collection).insert_many, messages, return_new=True)
+
+    async def latest(self, district: str, limit: int = 6) -> list[dict]:
+        """Returns the last ``limit`` messages of a district, oldest first."""
+        def query():
+            cursor = self.db.aql.execute(
+                """
+                FOR msg IN messages
+                    FILTER msg.district == @district
+                    SORT msg.order DESC
+                    LIMIT @limit
+                    RETURN msg
+                """,
+                bind_vars={"district": district, "limit": limit}
+            )
+            return [doc for doc in cursor][::-1]
+
+        return await self._run(query)
+
+
+    async def page(self, district: str, limit: int, before: Optional[int] = None, after: Optional[int] = None) -> list[dict]:
+        """
+        Returns up to ``limit`` messages older than ``before`` or newer than
+        ``after`` (the latest ones when neither is given), oldest first.
+
+        Both filters are ranges over the (district, order) index.
+        """
+        def query():
+            if after is not None:
+                cursor = self.db.aql.execute(
+                    """
+                    FOR msg IN messages
+                        FILTER msg.district == @district AND msg.order > @after
+                        SORT msg.order ASC
+                        LIMIT @limit
+                        RETURN msg
+                    """,
+                    bind_vars={"district": district, "after": after, "limit": limit}
+                )
+                return [doc for doc in cursor]
+
+            bind_vars = {"district": district, "limit": limit}
+            order_filter = ""
+            if before is not None:
+                order_filter = "AND msg.order < @before"
+                bind_vars["before"] = before
+            cursor = self.db.aql.execute(
+                f"""
+                FOR msg IN messages
+                    FILTER msg.district == @district {order_filter}
+                    SORT msg.order DESC
+                    LIMIT @limit
+                    RETURN msg
+                """,
+                bind_vars=bind_vars
+            )
+            return [doc for doc in cursor][::-1]
+
+        return await self._run(query)
+
+    async def latest_many(self, districts: list[str], limit: int) -> dict[str, list[dict]]:
+        """Returns the last ``limit`` messages of every district in a single query, oldest first."""
+        def query():
+            cursor = self.db.aql.execute(
+                """
+                FOR district IN @districts
+                    LET latest = (
+                        FOR msg IN messages
+                            FILTER msg.district == district
+                            SORT msg.order DESC
+                            LIMIT @limit
+                            RETURN msg
+                    )
+                    RETURN { district: district, messages: REVERSE(latest) }
+                """,
+                bind_vars={"districts": districts, "limit": limit}
+            )
+            return {row["district"]: row["messages"] for row in cursor}
+
+        return await self._run(query)
+
+
+class JobRepository(Repository):
+    collection = "jobs"
+
+    async def save(self, job: dict):
+        await self._run(self.db.collection(self.collection).insert, job, overwrite_mode="replace", silent=True)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self._run(self.db.collection(self.collection).get, job_id)
+
+
+def get_user_repository(request: Request) -> UserRepository:
+    return UserRepository(request.app.state.arango)
+
+
+def get_message_repository(request: Request) -> MessageRepository:
+    return MessageRepository(request.app.state.arango)
@@ -0,0 +1,82 @@
+import asyncio
+
+from arango.database import StandardDatabase
+from arango.exceptions import IndexCreateError
+
+from app.api.db.connection import ArangoConnectionManager
+from app.api.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Collections the API relies on and the indexes each one needs. add_index is
+# idempotent, so this can run on every startup.
+COLLECTIONS = {
+    "users": [
+        {"type": "persistent", "fields": ["email"], "unique": True, "name": "idx_users_email"},
+        {"type": "persistent", "fields": ["dni"], "unique": True, "name": "idx_users_dni"},
+    ],
+    "messages": [
+        {"type": "persistent", "fields": ["district", "order"], "name": "idx_messages_district_order"},
+    ],
+    "message_counters": [
+        {"type": "persistent", "fields": ["district"], "unique": True, "name": "idx_message_counters_district"},
+    ],
+    "response_cache": [
+        {"type": "ttl", "fields": ["purge_at"], "expireAfter": 0, "name": "idx_response_cache_purge_at"},
+    ],
+    "jobs": [
+        {"type": "ttl", "fields": ["purge_at"], "expireAfter": 0, "name": "idx_jobs_purge_at"},
+    ],
+    "rate_limits": [
+        {"type": "ttl", "fields": ["purge_at"], "expireAfter": 0, "name": "idx_rate_limits_purge_at"},
+    ],
+}
+
+
+INDEX_NAMES = {index["name"] for indexes in COLLECTIONS.values() for index in indexes}
+
+# Registration relies on these to reject duplicate users
+UNIQUE_USER_INDEXES = {"idx_users_email", "idx_users_dni"}
+
+
+def ensure_schema(db: StandardDatabase) -> set[str]:
+    """Creates missing collections and indexes, returning the names of the indexes now in place."""
+    created = set()
+    for name, indexes in COLLECTIONS.items():
+        if not db.has_collection(name):
+            db.create_collection(name)
+            logger.info(f"Colección creada: {name}")
+        collection = db.collection(name)
+        for index in indexes:
+            try:
+                collection.add_index(index)
+                created.add(index["name"])
+            except IndexCreateError as e:
+                # e.g. existing duplicates block a unique index; keep going with the rest
+                logger.error(f"No se pudo crear el índice {index['name']} en {name}: {e}")
+    if created == INDEX_NAMES:
+        logger.info("Esquema de ArangoDB verificado")
+    return created
+
+
+async def verify_schema(manager: ArangoConnectionManager) -> bool:
+    """Runs ``ensure_schema`` once, recording the indexes in place on ``manager``."""
+    try:
+        manager.verified_indexes = await manager.executor.run(ensure_schema, manager.db)
+    except Exception as e:
+        logger.error(f"No se pudo verificar el esquema de ArangoDB: {e}")
+        return False
+    return manager.verified_indexes == INDEX_NAMES
+
+
+async def maintain_schema(manager: ArangoConnectionManager, interval: float, max_interval: float):
+    """
+    Retries ``verify_schema`` with exponential backoff until every index is
+    in place, e.g. once ArangoDB comes back or duplicate rows are cleaned up.
+    """
+    delay = interval
+    while True:
+        await asyncio.sleep(delay)
+        if await verify_schema(manager):
+            return
+        delay = min(delay * 2, max_interval)
@@ -0,0 +1,93 @@
+import asyncio
+import hashlib
+import os
+from typing import Any, Callable, Iterable
+
+from app.api.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+FEATURES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def read_text_file(file_path):
+    absolute_file_path = os.path.join(FEATURES_DIR, file_path)
+
+    with open(absolute_file_path, 'r') as file:
+        return file.read()
+
+
+class ChainRegistry:
+    """
+    Builds LLM chains and agents once and hands out the same instance on every
+    request.
+
+    Each chain is registered with the prompt files it reads. ``reload_if_changed``
+    rebuilds a chain when one of its files changes on disk; ``watch`` runs it
+    periodically so prompts can be edited without a restart.
+    """
+
+    def __init__(self):
+        self._builders: dict[str, Callable[[], Any]] = {}
+        self._prompt_files: dict[str, list[str]] = {}
+        self._mtimes: dict[str, float] = {}
+        self._chains: dict[str, Any] = {}
+        self._versions: dict[str, str] = {}
+
+    def register(self, name: str, builder: Callable[[], Any], prompt_files: Iterable[str] = ()):
+        self._builders[name] = builder
+        self._prompt_files[name] = [os.path.join(FEATURES_DIR, path) for path in prompt_files]
+
+    def _build(self, name: str) -> Any:
+        mtimes = {path: os.path.getmtime(path) for path in self._prompt_files[name]}
+        digest = hashlib.sha256()
+        for path in self._prompt_files[name]:
+            with open(path, 'rb') as file:
+                digest.update(file.read())
+        chain = self._builders[name]()
+        self._mtimes.update(mtimes)
+        self._versions[name] = digest.hexdigest()[:16]
+        self._chains[name] = chain
+        return chain
+
+    def get(self, name: str) -> Any:
+        chain = self._chains.get(name)
+        if chain is None:
+            chain = self._build(name)
+        return chain
+
+    def version(self, name: str) -> str:
+        """Digest of the prompt files the current instance of ``name`` was built from."""
+        self.get(name)
+        return self._versions[name]
+
+    def warm_up(self):
+        for name in self._builders:
+            self._build(name)
+        logger.info(f"Cadenas inicializadas: {', '.join(self._builders)}")
+
+    def reload_if_changed(self) -> list[str]:
+        reloaded = []
+        for name, paths in self._prompt_files.items():
+            if name not in self._chains:
+                continue
+            if any(os.path.getmtime(path) != self._mtimes.get(path) for path in paths):
+                try:
+                    self._build(name)
+                    reloaded.append(name)
+                except Exception as e:
+                    logger.error(f"No se pudo recargar la cadena '{name}': {e}")
+        if reloaded:
+            logger.info(f"Cadenas recargadas: {', '.join(reloaded)}")
+        return reloaded
+
+    async def watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.reload_if_changed()
+            except OSError as e:
+                logger.error(f"Error al revisar los prompts: {e}")
+
+
+chains = ChainRegistry()
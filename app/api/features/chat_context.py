@@ -0,0 +1,232 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from app.api.logger import setup_logger
+from app.api.schemas.schemas import ChatMessage, Message
+
+logger = setup_logger(__name__)
+
+TRIM = "trim"
+SUMMARIZE = "summarize"
+
+# Gemini does not publish its tokenizer; cl100k_base is close enough to keep
+# prompts within budget
+ENCODING_NAME = "cl100k_base"
+
+
+class TokenCounter:
+    """
+    Counts tokens with tiktoken and remembers the count of every text it has
+    seen, keyed by its hash, so a conversation re-sent on each turn is only
+    tokenized once.
+
+    If the encoding cannot be loaded (e.g. no network to fetch it on first
+    use) counts fall back to an estimate of four characters per token.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._counts: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+        self._encoding = None
+        self._encoding_failed = False
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def encoding(self):
+        if self._encoding is None and not self._encoding_failed:
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding(ENCODING_NAME)
+            except Exception as e:
+                self._encoding_failed = True
+                logger.warning(f"No se pudo cargar la codificación {ENCODING_NAME}, se estimarán los tokens: {e}")
+        return self._encoding
+
+    def _tokenize(self, text: str) -> int:
+        if self.encoding is None:
+            return max(1, len(text) // 4) if text else 0
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def count(self, text: str) -> int:
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        with self._lock:
+            count = self._counts.get(key)
+            if count is not None:
+                self._counts.move_to_end(key)
+                self.hits += 1
+                return count
+            self.misses += 1
+
+        count = self._tokenize(text)
+        with self._lock:
+            self._counts[key] = count
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return count
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Keeps the first ``max_tokens`` tokens of ``text``."""
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is None:
+            return text[:max_tokens * 4]
+        tokens = self.encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else self.encoding.decode(tokens[:max_tokens])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._counts),
+                "hits": self.hits,
+                "misses": self.misses,
+                "estimated": self._encoding_failed,
+            }
+
+
+class ChatContextWindow:
+    """
+    Picks the chat history sent to the model by token budget instead of by
+    message count.
+
+    ``max_tokens`` bounds the whole rendered prompt: the template and its
+    other variables are counted first, then messages are taken newest first,
+    each with the framing it gets inside the prompt, until the budget is
+    reached. With the ``summarize`` strategy the messages that did not fit
+    are condensed into one leading system message of at most
+    ``summary_tokens`` tokens (the start of each message), so the model keeps
+    the gist of the earlier conversation without another LLM call.
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        strategy: Optional[str] = None,
+        summary_tokens: Optional[int] = None,
+        counter: Optional[TokenCounter] = None,
+    ):
+        self.max_tokens = max_tokens or int(os.getenv("CHAT_CONTEXT_MAX_TOKENS", "2000"))
+        self.strategy = strategy or os.getenv("CHAT_CONTEXT_STRATEGY", TRIM)
+        self.summary_tokens = summary_tokens or int(os.getenv("CHAT_CONTEXT_SUMMARY_TOKENS", "200"))
+        if self.summary_tokens > self.max_tokens // 2:
+            # The summary must leave room for the newest messages, the user's own turn among them
+            logger.warning(
+                f"CHAT_CONTEXT_SUMMARY_TOKENS={self.summary_tokens} no deja espacio para los mensajes recientes, "
+                f"se usará {self.max_tokens // 2}"
+            )
+            self.summary_tokens = self.max_tokens // 2
+        self.counter = counter or TokenCounter(int(os.getenv("TOKEN_COUNT_CACHE_SIZE", "4096")))
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens_total = 0
+        self.prompt_tokens_max = 0
+        self.prompt_tokens_last = 0
+        self.trimmed_messages = 0
+        self.summarized_requests = 0
+
+    def _summarize(self, dropped: list[Message]) -> Optional[ChatMessage]:
+        header = "Resumen de la conversación anterior:"
+        budget = self.summary_tokens - self._framed_tokens(ChatMessage(role="system", type="text", text=header))
+        lines = []
+        # Newest dropped messages are the most relevant, so they get the budget first
+        for message in reversed(dropped):
+            if budget <= 0:
+                break
+            line = f"{message.role.value}: {' '.join(message.payload.text.split())}"
+            line = self.counter.truncate(line, min(budget, 60))
+            budget -= self.counter.count(line)
+            if budget < 0:
+                break
+            lines.append(line)
+        if not lines:
+            return None
+        text = header + "\n" + "\n".join(reversed(lines))
+        return ChatMessage(role="system", type="text", text=text)
+
+    def _framed_tokens(self, message: ChatMessage) -> int:
+        # The history fills the prompt as the repr of a list, so each message
+        # also costs its field names, quotes and the ", " separator
+        return self.counter.count(repr(message)) + 1
+
+    def build(self, messages: list[Message], render: Optional[Callable[[list[ChatMessage]], str]] = None) -> list[ChatMessage]:
+        """
+        Returns the history that fits the budget, oldest first.
+
+        ``render`` turns a history into the full prompt sent to the model. The
+        prompt without history counts against ``max_tokens`` first, and the
+        prompt token metrics are taken from the final rendered prompt.
+        """
+        fixed = self.counter.count(render([])) if render is not None else 0
+        budget = self.max_tokens - fixed
+        if self.strategy == SUMMARIZE:
+            budget -= self.summary_tokens
+
+        kept: list[ChatMessage] = []
+        used = 0
+        index = len(messages)
+        while index > 0:
+            message = messages[index - 1]
+            chat_message = ChatMessage(role=message.role, type=message.type, text=message.payload.text)
+            tokens = self._framed_tokens(chat_message)
+            if used + tokens > budget:
+                framing = self._framed_tokens(ChatMessage(role=message.role, type=message.type, text=""))
+                if not kept and budget - framing > 0:
+                    # A single pasted message larger than the budget is cut, not dropped
+                    text = self.counter.truncate(message.payload.text, budget - framing)
+                    chat_message = ChatMessage(role=message.role, type=message.type, text=text)
+                    if self._framed_tokens(chat_message) <= budget:
+                        kept.append(chat_message)
+                        used += self._framed_tokens(chat_message)
+                        index -= 1
+                break
+            kept.append(chat_message)
+            used += tokens
+            index -= 1
+        kept.reverse()
+
+        dropped = messages[:index]
+        summarized = False
+        if dropped and self.strategy == SUMMARIZE:
+            summary = self._summarize(dropped)
+            if summary is not None:
+                kept.insert(0, summary)
+                summarized = True
+
+        if render is None:
+            prompt_tokens = sum(map(self._framed_tokens, kept))
+        else:
+            prompt_tokens = self.counter.count(render(kept))
+            # Tokens can merge differently across message boundaries, so the
+            # sum of the parts is only an estimate of the rendered prompt
+            while prompt_tokens > self.max_tokens and kept:
+                kept.pop(0)
+                prompt_tokens = self.counter.count(render(kept))
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens_total += prompt_tokens
+            self.prompt_tokens_max = max(self.prompt_tokens_max, prompt_tokens)
+            self.prompt_tokens_last = prompt_tokens
+            self.trimmed_messages += len(dropped)
+            self.summarized_requests += summarized
+        return kept
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_tokens": self.max_tokens,
+                "strategy": self.strategy,
+                "requests": self.requests,
+                "prompt_tokens_last": self.prompt_tokens_last,
+                "prompt_tokens_max": self.prompt_tokens_max,
+                "prompt_tokens_avg": round(self.prompt_tokens_total / self.requests, 1) if self.requests else 0.0,
+                "trimmed_messages": self.trimmed_messages,
+                "summarized_requests": self.summarized_requests,
+                "token_counts": self.counter.stats(),
+            }
+
+
+chat_context = ChatContextWindow()
@@ -1,25 +1,22 @@
 from langchain_google_genai import GoogleGenerativeAI
 from langchain.prompts import PromptTemplate
-import os
 from dotenv import load_dotenv, find_dotenv
-from app.api.schemas.schemas import ChatMessage, Message
+from app.api.features.chain_registry import chains, read_text_file
+from app.api.features.chat_context import chat_context
+from app.api.features.concurrency import provider_slot
+from app.api.features.llm_metrics import llm_metrics
+from app.api.schemas.schemas import Message
 
 load_dotenv(find_dotenv())
 
-def read_text_file(file_path):
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-
-    absolute_file_path = os.path.join(script_dir, file_path)
-    
-    with open(absolute_file_path, 'r') as file:
-        return file.read()
+CHATBOT_PROMPT_FILE = "prompt/chatbot-prompt.txt"
 
 def build_prompt():
     """
     Build the prompt for the model.
     """
     
-    template = read_text_file("prompt/chatbot-prompt.txt")
+    template = read_text_file(CHATBOT_PROMPT_FILE)
     prompt = PromptTemplate(
         template=template,
         input_variables=["text"],
@@ -27,24 +24,46 @@ def build_prompt():
     
     return prompt
 
-
-def chatbot_executor(user_name: str, user_query: str, messages: list[Message], k=10):
-    
-    # create a memory list of last k = 3 messages
-    chat_context = [
-        ChatMessage(
-            role=message.role, 
-            type=message.type, 
-            text=message.payload.text
-        ) for message in messages[-k:]
-    ]
-
+def build_chatbot_chain():
     prompt = build_prompt()
     
-    llm = GoogleGenerativeAI(model="gemini-1.5-flash") 
+    llm = GoogleGenerativeAI(model="gemini-1.5-flash", callbacks=[llm_metrics])
+    
+    return prompt | llm
+
+chains.register("chatbot", build_chatbot_chain, prompt_files=[CHATBOT_PROMPT_FILE])
+
+
+def build_chat_context(messages: list[Message], user_name: str = "", user_query: str = ""):
+    # keep as many recent messages as fit the token budget of the full prompt
+    prompt = chains.get("chatbot").first
+    return chat_context.build(
+        messages,
+        lambda history: prompt.format(chat_history=history, user_name=user_name, user_query=user_query),
+    )
+
+async def chatbot_executor(user_name: str, user_query: str, messages: list[Message]):
     
-    chain =  prompt | llm
+    history = build_chat_context(messages, user_name, user_query)
+
+    chain = chains.get("chatbot")
     
-    response = chain.invoke({"chat_history": chat_context, "user_name": user_name, "user_query": user_query})
+    async with provider_slot("gemini-flash"):
+        response = await chain.ainvoke({"chat_history": history, "user_name": user_name, "user_query": user_query})
     
     return response
+
+async def stream_chatbot_executor(user_name: str, user_query: str, messages: list[Message]):
+    """
+    Yields the answer chunk by chunk as Gemini produces it.
+
+    Closing the generator (e.g. when the client disconnects) stops the
+    upstream generation.
+    """
+    history = build_chat_context(messages, user_name, user_query)
+
+    chain = chains.get("chatbot")
+
+    async with provider_slot("gemini-flash"):
+        async for chunk in chain.astream({"chat_history": history, "user_name": user_name, "user_query": user_query}):
+            yield chunk
@@ -0,0 +1,93 @@
+import asyncio
+import math
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException, status
+
+from app.api.metrics import span
+
+
+class ProviderLimiter:
+    """
+    Caps the number of concurrent calls to one LLM or search provider.
+
+    Callers over the limit wait up to ``max_wait`` seconds for a slot and are
+    then rejected with a 503; ``max_wait=0`` rejects immediately.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_wait: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls, name: str, max_concurrency: int, max_wait: float) -> "ProviderLimiter":
+        prefix = "LLM_" + name.upper().replace("-", "_") + "_"
+        return cls(
+            name,
+            int(os.getenv(prefix + "CONCURRENCY", max_concurrency)),
+            float(os.getenv(prefix + "MAX_WAIT", max_wait)),
+        )
+
+    def _reject(self):
+        self.rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="El servicio está ocupado, inténtalo nuevamente en unos segundos",
+            headers={"Retry-After": str(max(1, math.ceil(self.max_wait)))},
+        )
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.max_wait <= 0:
+            if self._semaphore.locked():
+                self._reject()
+            await self._semaphore.acquire()
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                self._reject()
+            finally:
+                self.waiting -= 1
+
+        self.active += 1
+        try:
+            with span("llm", self.name):
+                yield
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+limiters = {
+    "gemini-flash": ProviderLimiter.from_env("gemini-flash", max_concurrency=16, max_wait=5),
+    "gemini-pro": ProviderLimiter.from_env("gemini-pro", max_concurrency=4, max_wait=10),
+    "openai-gpt-4o-mini": ProviderLimiter.from_env("openai-gpt-4o-mini", max_concurrency=4, max_wait=10),
+    "tavily": ProviderLimiter.from_env("tavily", max_concurrency=4, max_wait=10),
+}
+
+
+def provider_slot(provider: str):
+    return limiters[provider].slot()
+
+
+def provider_stats() -> dict:
+    return {name: limiter.stats() for name, limiter in limiters.items()}
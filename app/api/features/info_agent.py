@@ -1,17 +1,25 @@
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.prompts import PromptTemplate
-from langchain_google_genai import GoogleGenerativeAI
 from langchain_openai import ChatOpenAI
 from app.api.logger import setup_logger
 from langchain_community.tools.tavily_search import TavilySearchResults
 from langgraph.prebuilt import create_react_agent
-import os
+from app.api.features.chain_registry import chains
+from app.api.features.concurrency import provider_slot
+from app.api.features.llm_metrics import llm_metrics
+from app.api.features.structured_output import StructuredOutputValidator
+from langchain_core.tools import StructuredTool
+from app.api.cache import ResponseCache, cache_key
 from langchain.schema import (
        AIMessage,
        HumanMessage,
        SystemMessage
 )
 from dotenv import load_dotenv, find_dotenv
+from fastapi import HTTPException, status
+from typing import Optional
+import asyncio
+import os
 
 from app.api.schemas.info_agent_schemas import InfoAgentArgs, SecurityPlanDataCollection
 
@@ -21,25 +29,154 @@ logger = setup_logger(__name__)
 
 parser = JsonOutputParser(pydantic_object=SecurityPlanDataCollection)
 
-model = GoogleGenerativeAI(model="gemini-1.5-pro")
+FORMAT_INSTRUCTIONS = parser.get_format_instructions()
 
-def read_text_file(file_path):
-    # Get the directory containing the script file
-    script_dir = os.path.dirname(os.path.abspath(__file__))
+info_output = StructuredOutputValidator("info_agent", SecurityPlanDataCollection)
 
-    # Combine the script directory with the relative file path
-    absolute_file_path = os.path.join(script_dir, file_path)
-    
-    with open(absolute_file_path, 'r') as file:
-        return file.read()
-    
-chat_openai_llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.7)
+# Emergency contacts and help centers change over days, so results are
+# served from cache and refreshed in the background once they expire
+info_cache = ResponseCache(
+    "info_agent",
+    max_entries=int(os.getenv("INFO_AGENT_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("INFO_AGENT_CACHE_TTL", "21600")),
+    stale_ttl=float(os.getenv("INFO_AGENT_CACHE_STALE_TTL", "604800")),
+)
 
-def generate_info_agent_results(data: InfoAgentArgs):
-    logger.info("Buscando información")
+chat_openai_llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.7, callbacks=[llm_metrics])
+
+def build_search_tool():
     search = TavilySearchResults(max_results=2)
-    tools = [search]
-    agent_executor = create_react_agent(chat_openai_llm, tools)
+
+    async def limited_search(query: str):
+        async with provider_slot("tavily"):
+            return await search.ainvoke({"query": query})
+
+    return StructuredTool.from_function(
+        coroutine=limited_search,
+        name=search.name,
+        description=search.description,
+        args_schema=search.args_schema,
+    )
+
+def build_info_agent():
+    tools = [build_search_tool()]
+    return create_react_agent(chat_openai_llm, tools)
+
+chains.register("info_agent", build_info_agent)
+
+def location_key(data: InfoAgentArgs) -> str:
+    return cache_key("info_agent", data.department, data.province, data.district)
+
+async def generate_info_agent_results(data: InfoAgentArgs, cancel_abandoned: bool = False):
+    """
+    Returns the security data for the location of ``data``. Results are cached
+    per department/province/district, so ``description`` only shapes the
+    search that fills or refreshes the entry. With ``cancel_abandoned`` a
+    search nobody waits for any more is stopped.
+    """
+    return await info_cache.get_stale_while_revalidate(
+        location_key(data), lambda: run_info_agent(data), cancel_abandoned=cancel_abandoned
+    )
+
+class InfoAgentPrewarmer:
+    """
+    Refreshes the cache for a list of locations in the background, a few at
+    a time, so a large prewarm neither fails on provider limits nor takes
+    every OpenAI slot from live users.
+
+    Locations wait in a queue of at most ``queue_limit``; ``concurrency``
+    workers refresh them. A refresh rejected because the provider is busy
+    (503) is retried up to ``retries`` times with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        queue_limit: Optional[int] = None,
+        retries: Optional[int] = None,
+        retry_delay: Optional[float] = None,
+    ):
+        self.concurrency = concurrency or int(os.getenv("INFO_AGENT_PREWARM_CONCURRENCY", "1"))
+        self.queue_limit = queue_limit or int(os.getenv("INFO_AGENT_PREWARM_QUEUE_LIMIT", "500"))
+        self.retries = retries if retries is not None else int(os.getenv("INFO_AGENT_PREWARM_RETRIES", "3"))
+        self.retry_delay = retry_delay or float(os.getenv("INFO_AGENT_PREWARM_RETRY_DELAY", "30"))
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_limit)
+        self._workers: list[asyncio.Task] = []
+        self.scheduled = 0
+        self.skipped = 0
+        self.refreshed = 0
+        self.retried = 0
+        self.failed = 0
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def schedule(self, locations: list[InfoAgentArgs]) -> int:
+        """Queues ``locations`` and returns how many fit in the queue."""
+        scheduled = 0
+        for data in locations:
+            try:
+                self._queue.put_nowait(data)
+            except asyncio.QueueFull:
+                break
+            scheduled += 1
+        self.scheduled += scheduled
+        self.skipped += len(locations) - scheduled
+        return scheduled
+
+    async def _refresh(self, data: InfoAgentArgs):
+        for attempt in range(self.retries + 1):
+            try:
+                # The load may be shared with users' requests, which must not be
+                # cancelled along with the prewarm
+                await asyncio.shield(info_cache.refresh(location_key(data), lambda: run_info_agent(data)))
+            except HTTPException as e:
+                if e.status_code != status.HTTP_503_SERVICE_UNAVAILABLE or attempt >= self.retries:
+                    break
+                self.retried += 1
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+            except Exception:
+                # Already logged by the cache
+                break
+            else:
+                self.refreshed += 1
+                return
+        self.failed += 1
+
+    async def _work(self):
+        while True:
+            data = await self._queue.get()
+            await self._refresh(data)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "queued": self._queue.qsize(),
+            "scheduled": self.scheduled,
+            "skipped": self.skipped,
+            "refreshed": self.refreshed,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+
+info_prewarmer = InfoAgentPrewarmer()
+
+async def reask_info_agent(prompt: str) -> str:
+    async with provider_slot("openai-gpt-4o-mini"):
+        response = await chat_openai_llm.ainvoke(prompt)
+    return response.content
+
+async def run_info_agent(data: InfoAgentArgs):
+    logger.info("Buscando información")
+    agent_executor = chains.get("info_agent")
     ai_related_message = f"""
     Realiza una búsqueda exhaustiva y precisa en Tavily sobre información de seguridad real y verificada para la siguiente ubicación:
 
@@ -52,7 +189,7 @@ def generate_info_agent_results(data: InfoAgentArgs):
 
     Utiliza Tavily exclusivamente para brindar información actual, relevante y basada en datos reales de seguridad para esta ubicación específica. Asegúrate de no inventar información y de basarte únicamente en datos confirmados. No proporciones contenido especulativo ni sin verificación.
 
-    La respuesta debe seguir estrictamente el formato y los requisitos especificados en {parser.get_format_instructions()}.
+    La respuesta debe seguir estrictamente el formato y los requisitos especificados en {FORMAT_INSTRUCTIONS}.
     """
 
     messages = [
@@ -60,12 +197,17 @@ def generate_info_agent_results(data: InfoAgentArgs):
         HumanMessage(content=ai_related_message)
     ]
 
-    result = agent_executor.invoke({'messages': messages})
+    async def produce():
+        # The whole ReAct loop counts as one OpenAI slot, Tavily calls take their own
+        async with provider_slot("openai-gpt-4o-mini"):
+            result = await agent_executor.ainvoke({'messages': messages})
+
+        logger.info(f"Agente de información completado en {len(result['messages'])} mensajes")
 
-    logger.info(result)
+        return result["messages"][-1].content
 
-    parsed_result = parser.parse(result["messages"][-1].content)
+    parsed_result = await info_output.generate(produce, reask_info_agent)
 
-    logger.info(f"Resultados de la Búsqueda de Información de Seguridad: {parsed_result}")
+    logger.info(f"Resultados de la Búsqueda de Información de Seguridad para {data.district}: {len(parsed_result['emergency_contacts'])} contactos de emergencia, {len(parsed_result['help_centers'])} centros de ayuda")
 
-    return parsed_result
\ No newline at end of file
+    return parsed_result
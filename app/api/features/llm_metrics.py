@@ -0,0 +1,58 @@
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from app.api.metrics import record_llm_tokens
+
+
+def model_name(serialized: dict, invocation_params: dict) -> str:
+    for source in (invocation_params or {}, (serialized or {}).get("kwargs") or {}):
+        name = source.get("model") or source.get("model_name")
+        if name:
+            return str(name)
+    return "unknown"
+
+
+def token_usage(response: LLMResult) -> tuple[int, int]:
+    """Returns ``(prompt_tokens, completion_tokens)`` as reported by the provider."""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    prompt_tokens = usage.get("prompt_tokens", 0)
+    completion_tokens = usage.get("completion_tokens", 0)
+    if prompt_tokens or completion_tokens:
+        return prompt_tokens, completion_tokens
+
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            metadata = getattr(message, "usage_metadata", None) or (generation.generation_info or {}).get("usage_metadata") or {}
+            prompt_tokens += metadata.get("input_tokens", metadata.get("prompt_token_count", 0)) or 0
+            completion_tokens += metadata.get("output_tokens", metadata.get("candidates_token_count", 0)) or 0
+    return prompt_tokens, completion_tokens
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """Counts prompt and completion tokens per model for every LLM call it is attached to."""
+
+    # Runs on the event loop instead of a worker thread, metrics are not thread safe
+    run_inline = True
+
+    def __init__(self):
+        self._models: dict[UUID, str] = {}
+
+    def on_llm_start(self, serialized: dict, prompts: list, *, run_id: UUID, **kwargs: Any):
+        self._models[run_id] = model_name(serialized, kwargs.get("invocation_params"))
+
+    def on_chat_model_start(self, serialized: dict, messages: list, *, run_id: UUID, **kwargs: Any):
+        self._models[run_id] = model_name(serialized, kwargs.get("invocation_params"))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        model = self._models.pop(run_id, "unknown")
+        record_llm_tokens(model, *token_usage(response))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._models.pop(run_id, None)
+
+
+llm_metrics = LLMMetricsCallback()
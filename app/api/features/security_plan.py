@@ -2,11 +2,17 @@ from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.prompts import PromptTemplate
 from langchain_google_genai import GoogleGenerativeAI
 from app.api.logger import setup_logger
+from app.api.features.chain_registry import chains, read_text_file
+from app.api.features.concurrency import provider_slot
+from app.api.features.llm_metrics import llm_metrics
+from app.api.features.structured_output import JsonListItemScanner, StructuredOutputValidator
+from app.api.cache import ResponseCache, cache_key
 
+import json
 import os
 
 from dotenv import load_dotenv, find_dotenv
-from app.api.schemas.security_plan_schemas import SecurityPlan
+from app.api.schemas.security_plan_schemas import SecurityPlan, SecurityPlanInput
 
 load_dotenv(find_dotenv())
 
@@ -14,32 +20,123 @@ logger = setup_logger(__name__)
 
 parser = JsonOutputParser(pydantic_object=SecurityPlan)
 
-model = GoogleGenerativeAI(model="gemini-1.5-pro")
-
-def read_text_file(file_path):
-    # Get the directory containing the script file
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-
-    # Combine the script directory with the relative file path
-    absolute_file_path = os.path.join(script_dir, file_path)
-    
-    with open(absolute_file_path, 'r') as file:
-        return file.read()
-
-prompt = PromptTemplate(
-  template=read_text_file('prompt/generate-security-plan-prompt.txt'),
-  input_variables=[
-    "department",
-    "province",
-    "district",
-    "mainTopic",
-    "additionalDescription"
-  ],
-  partial_variables={"format_instructions": parser.get_format_instructions()}
+model = GoogleGenerativeAI(model="gemini-1.5-pro", callbacks=[llm_metrics])
+
+plan_cache = ResponseCache(
+    "security_plan",
+    max_entries=int(os.getenv("SECURITY_PLAN_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("SECURITY_PLAN_CACHE_TTL", "86400")),
 )
 
-def compile_security_plan_chain():
+plan_output = StructuredOutputValidator("security_plan", SecurityPlan)
+
+SECURITY_PLAN_SECTIONS = (
+    "risk_identifications",
+    "roles_and_responsibilities",
+    "assets",
+    "incident_response_procedures",
+    "training_plan",
+    "security_policies",
+)
+
+SECURITY_PLAN_PROMPT_FILE = 'prompt/generate-security-plan-prompt.txt'
+
+def build_prompt():
+    return PromptTemplate(
+      template=read_text_file(SECURITY_PLAN_PROMPT_FILE),
+      input_variables=[
+        "department",
+        "province",
+        "district",
+        "mainTopic",
+        "additionalDescription"
+      ],
+      partial_variables={"format_instructions": parser.get_format_instructions()}
+    )
+
+def build_security_plan_chain():
     logger.info("Compilando cadena...")
-    chain = prompt | model | parser
+    # Output is validated by plan_output, which can repair it item by item
+    chain = build_prompt() | model
     logger.info("La cadena se ha compilado satisfactoriamente")
-    return chain
\ No newline at end of file
+    return chain
+
+chains.register("security_plan", build_security_plan_chain, prompt_files=[SECURITY_PLAN_PROMPT_FILE])
+
+def compile_security_plan_chain():
+    return chains.get("security_plan")
+
+async def generate_security_plan(data: SecurityPlanInput, cancel_abandoned: bool = False):
+    """
+    Returns the plan for ``data``, reusing a cached generation for the same
+    normalized input and prompt version. Concurrent identical requests share a
+    single model call; with ``cancel_abandoned`` it is stopped once every
+    caller has been cancelled.
+    """
+    key = cache_key("security_plan", chains.version("security_plan"), data.dict())
+    return await plan_cache.get_or_load(key, lambda: run_security_plan_chain(data), cancel_abandoned=cancel_abandoned)
+
+def security_plan_inputs(data: SecurityPlanInput) -> dict:
+    return {
+        "department": data.department,
+        "province": data.province,
+        "district": data.district,
+        "mainTopic": data.mainTopic,
+        "additionalDescription": data.additionalDescription
+    }
+
+async def stream_security_plan(data: SecurityPlanInput):
+    """
+    Yields ``("item", {...})`` for each list item of the plan as soon as the
+    model finishes writing it, then ``("plan", plan)`` with the validated plan.
+
+    ``index`` is the item's position in the model's list. Items that fail
+    validation are not streamed, leaving a gap at their index; the final plan
+    carries them once they have been repaired, and is authoritative if some
+    could not be. A cached plan is replayed right away.
+    """
+    key = cache_key("security_plan", chains.version("security_plan"), data.dict())
+    plan = await plan_cache.get(key)
+    if plan is not None:
+        for field_name in SECURITY_PLAN_SECTIONS:
+            for index, item in enumerate(plan.get(field_name, [])):
+                yield "item", {"section": field_name, "index": index, "data": item}
+        yield "plan", plan
+        return
+
+    chain = compile_security_plan_chain()
+    scanner = JsonListItemScanner()
+    counts = dict.fromkeys(SECURITY_PLAN_SECTIONS, 0)
+
+    async with provider_slot("gemini-pro"):
+        async for chunk in chain.astream(security_plan_inputs(data)):
+            for field_name, item_text in scanner.feed(chunk):
+                if field_name not in counts:
+                    continue
+                # Position in the raw list, which is where the final plan puts
+                # the item back once it is repaired
+                index = counts[field_name]
+                counts[field_name] += 1
+                try:
+                    item = plan_output.validate_item(field_name, json.loads(item_text, strict=False))
+                except json.JSONDecodeError:
+                    item = None
+                if item is not None:
+                    yield "item", {"section": field_name, "index": index, "data": item}
+
+    plan = await plan_output.parse_and_validate(scanner.text, reask_security_plan)
+    await plan_cache.set(key, plan)
+    yield "plan", plan
+
+async def reask_security_plan(prompt: str) -> str:
+    async with provider_slot("gemini-pro"):
+        return await model.ainvoke(prompt)
+
+async def run_security_plan_chain(data: SecurityPlanInput):
+    chain = compile_security_plan_chain()
+
+    async def produce():
+        async with provider_slot("gemini-pro"):
+            return await chain.ainvoke(security_plan_inputs(data))
+
+    return await plan_output.generate(produce, reask_security_plan)
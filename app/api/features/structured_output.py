@@ -0,0 +1,325 @@
+import asyncio
+import json
+import os
+import re
+from typing import Any, Awaitable, Callable, List, Optional, Type, get_args, get_origin
+
+from langchain_core.prompts import PromptTemplate
+from langchain_core.utils.json import parse_partial_json
+from pydantic import BaseModel, ValidationError
+
+from app.api.features.chain_registry import read_text_file
+from app.api.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+REPAIR_ITEM_PROMPT_FILE = "prompt/repair-item-prompt.txt"
+
+FENCED_JSON_RE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+PHONE_SEPARATORS_RE = re.compile(r"[\s\-().]")
+SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+# Sends a prompt to the model and returns its raw text answer
+Reask = Callable[[str], Awaitable[str]]
+
+
+class StructuredOutputError(ValueError):
+    """The model output could not be turned into a valid object, even after repairs."""
+
+
+def extract_json_text(text: str) -> str:
+    """Strips markdown fences and any prose before the first ``{`` or ``[``."""
+    fenced = FENCED_JSON_RE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    return text[min(starts):] if starts else text
+
+
+def repair_json(text: str) -> Any:
+    """
+    Parses JSON written by a model, fixing the usual defects: markdown fences,
+    surrounding prose, typographic quotes, trailing commas, raw newlines inside
+    strings and output cut off before the closing brackets.
+    """
+    candidate = extract_json_text(text.strip())
+    try:
+        value, _ = json.JSONDecoder(strict=False).raw_decode(candidate)
+        return value
+    except json.JSONDecodeError:
+        pass
+
+    candidate = TRAILING_COMMA_RE.sub(r"\1", candidate.translate(SMART_QUOTES))
+    try:
+        value = parse_partial_json(candidate)
+    except json.JSONDecodeError:
+        value = None
+    if value is None:
+        raise StructuredOutputError("La respuesta del modelo no contiene un JSON válido")
+    return value
+
+
+def list_item_model(annotation: Any) -> Optional[Type[BaseModel]]:
+    if get_origin(annotation) in (list, List):
+        args = get_args(annotation)
+        if args and isinstance(args[0], type) and issubclass(args[0], BaseModel):
+            return args[0]
+    return None
+
+
+class JsonListItemScanner:
+    """
+    Finds the items of the top-level lists of a JSON object while it is still
+    being streamed.
+
+    ``feed`` takes the next chunk of text and returns ``(field, item_text)`` for
+    every list item that was completed by it. Each character is scanned once,
+    so the cost over the whole stream is linear.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_key: Optional[str] = None
+        self._field: Optional[str] = None
+        self._item_start = 0
+
+    def feed(self, chunk: str) -> list[tuple[str, str]]:
+        completed = []
+        offset = len(self.text)
+        self.text += chunk
+        for position in range(offset, len(self.text)):
+            char = self.text[position]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._stack == ["{"]:
+                        self._last_key = self.text[self._string_start + 1:position]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = position
+            elif char == "[":
+                if self._stack == ["{"]:
+                    self._field = self._last_key
+                self._stack.append(char)
+            elif char == "{":
+                if self._stack == ["{", "["]:
+                    self._item_start = position
+                self._stack.append(char)
+            elif char in "]}" and self._stack:
+                self._stack.pop()
+                if char == "}" and self._stack == ["{", "["] and self._field is not None:
+                    completed.append((self._field, self.text[self._item_start:position + 1]))
+        return completed
+
+
+class StructuredOutputValidator:
+    """
+    Turns raw model output into a validated ``model`` dict.
+
+    JSON defects are repaired locally. Each item of the model's list fields is
+    validated on its own, so one bad ``EmergencyContact`` only costs a small
+    re-ask for that item instead of regenerating the whole object. Items that
+    still fail after ``max_reasks`` re-asks are dropped.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model: Type[BaseModel],
+        max_reasks: Optional[int] = None,
+        max_regenerations: Optional[int] = None,
+    ):
+        self.name = name
+        self.model = model
+        self.max_reasks = max_reasks if max_reasks is not None else int(os.getenv("STRUCTURED_OUTPUT_MAX_REASKS", "5"))
+        if max_regenerations is None:
+            max_regenerations = int(os.getenv("STRUCTURED_OUTPUT_MAX_REGENERATIONS", "1"))
+        self.max_regenerations = max_regenerations
+        self._item_models = {
+            field_name: item_model
+            for field_name, field in model.model_fields.items()
+            if (item_model := list_item_model(field.annotation)) is not None
+        }
+        self.outputs = 0
+        self.clean = 0
+        self.json_repairs = 0
+        self.field_fixes = 0
+        self.item_reasks = 0
+        self.item_reask_failures = 0
+        self.dropped_items = 0
+        self.failures = 0
+        self.regenerations = 0
+
+    def parse(self, text: str) -> Any:
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            pass
+        value = repair_json(text)
+        self.json_repairs += 1
+        return value
+
+    def _fix_fields(self, model: Type[BaseModel], data: dict, error: ValidationError, drop_optional: bool) -> Optional[dict]:
+        """
+        Applies local fixes for the errors in ``error``, or returns None if some
+        cannot be fixed. With ``drop_optional`` invalid optional fields are
+        cleared instead of being fixed.
+        """
+        fixed = dict(data)
+        for detail in error.errors():
+            if len(detail["loc"]) != 1 or detail["loc"][0] not in model.model_fields:
+                return None
+            field_name = detail["loc"][0]
+            value = fixed.get(field_name)
+            if drop_optional and not model.model_fields[field_name].is_required():
+                fixed[field_name] = None
+            elif detail["type"] == "string_pattern_mismatch" and isinstance(value, str):
+                # e.g. "(01) 411-8000" for a phone number
+                fixed[field_name] = PHONE_SEPARATORS_RE.sub("", value)
+            elif detail["type"] == "string_type" and isinstance(value, (int, float)):
+                fixed[field_name] = str(value)
+            elif not model.model_fields[field_name].is_required():
+                fixed[field_name] = None
+            else:
+                return None
+        return fixed
+
+    def _validate(self, model: Type[BaseModel], data: Any) -> Optional[dict]:
+        if not isinstance(data, dict):
+            return None
+        try:
+            return model(**data).dict()
+        except ValidationError as e:
+            error = e
+        for drop_optional in (False, True):
+            data = self._fix_fields(model, data, error, drop_optional)
+            if data is None:
+                return None
+            try:
+                value = model(**data).dict()
+            except ValidationError as e:
+                error = e
+                continue
+            self.field_fixes += 1
+            return value
+        return None
+
+    def validate_item(self, field_name: str, data: Any) -> Optional[dict]:
+        """Validates one item of the list field ``field_name``, applying local fixes only."""
+        item_model = self._item_models.get(field_name)
+        return self._validate(item_model, data) if item_model is not None else None
+
+    async def _reask_item(self, model: Type[BaseModel], item: Any, reask: Reask) -> Optional[dict]:
+        self.item_reasks += 1
+        error = "El elemento no es un objeto JSON"
+        if isinstance(item, dict):
+            try:
+                model(**item)
+            except ValidationError as e:
+                error = str(e)
+        prompt = PromptTemplate.from_template(read_text_file(REPAIR_ITEM_PROMPT_FILE)).format(
+            schema=json.dumps(model.model_json_schema(), ensure_ascii=False),
+            item=json.dumps(item, ensure_ascii=False, default=str),
+            errors=error,
+        )
+        try:
+            value = self._validate(model, self.parse(await reask(prompt)))
+        except Exception as e:
+            logger.warning(f"Falló la corrección de un elemento de {self.name}: {e}")
+            value = None
+        if value is None:
+            self.item_reask_failures += 1
+        return value
+
+    async def validate(self, data: Any, reask: Optional[Reask] = None) -> dict:
+        if not isinstance(data, dict):
+            self.failures += 1
+            raise StructuredOutputError("La respuesta del modelo no es un objeto JSON")
+
+        data = dict(data)
+        invalid: list[tuple[str, int, Type[BaseModel], Any]] = []
+        for field_name, item_model in self._item_models.items():
+            items = data.get(field_name)
+            if not isinstance(items, list):
+                continue
+            validated = []
+            for item in items:
+                value = self._validate(item_model, item)
+                if value is None:
+                    invalid.append((field_name, len(validated), item_model, item))
+                validated.append(value)
+            data[field_name] = validated
+
+        reasks = invalid[:self.max_reasks] if reask is not None else []
+        results = await asyncio.gather(*(self._reask_item(model, item, reask) for _, _, model, item in reasks))
+        for (field_name, index, _, _), value in zip(reasks, results):
+            data[field_name][index] = value
+        for field_name in self._item_models:
+            if isinstance(data.get(field_name), list):
+                kept = [item for item in data[field_name] if item is not None]
+                self.dropped_items += len(data[field_name]) - len(kept)
+                data[field_name] = kept
+
+        value = self._validate(self.model, data)
+        if value is None:
+            self.failures += 1
+            raise StructuredOutputError(f"La respuesta del modelo no cumple el esquema de {self.name}")
+        return value
+
+    async def parse_and_validate(self, text: str, reask: Optional[Reask] = None) -> dict:
+        self.outputs += 1
+        counters = (self.json_repairs, self.field_fixes, self.item_reasks, self.dropped_items)
+        try:
+            data = self.parse(text)
+        except StructuredOutputError:
+            self.failures += 1
+            raise
+        value = await self.validate(data, reask)
+        if counters == (self.json_repairs, self.field_fixes, self.item_reasks, self.dropped_items):
+            self.clean += 1
+        return value
+
+    async def generate(self, produce: Callable[[], Awaitable[str]], reask: Optional[Reask] = None) -> dict:
+        """
+        Runs ``produce`` and validates its output. The whole generation is only
+        repeated, up to ``max_regenerations`` times, when the output cannot be
+        salvaged at all.
+        """
+        attempt = 0
+        while True:
+            try:
+                return await self.parse_and_validate(await produce(), reask)
+            except StructuredOutputError as e:
+                if attempt >= self.max_regenerations:
+                    raise
+                attempt += 1
+                self.regenerations += 1
+                logger.warning(f"Regenerando {self.name}: {e}")
+
+    def stats(self) -> dict:
+        rate = lambda count: round(count / self.outputs, 4) if self.outputs else 0.0
+        return {
+            "outputs": self.outputs,
+            "clean": self.clean,
+            "json_repairs": self.json_repairs,
+            "field_fixes": self.field_fixes,
+            "item_reasks": self.item_reasks,
+            "item_reask_failures": self.item_reask_failures,
+            "dropped_items": self.dropped_items,
+            "failures": self.failures,
+            "regenerations": self.regenerations,
+            "repair_rate": rate(self.outputs - self.clean - self.failures),
+            "failure_rate": rate(self.failures),
+            "regeneration_rate": rate(self.regenerations),
+        }
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import httpx
+from fastapi import Request
+
+from app.api.logger import setup_logger
+from app.api.metrics import span
+
+logger = setup_logger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+@dataclass
+class UpstreamConfig:
+    base_url: str
+    max_connections: int = 10
+    max_keepalive_connections: int = 5
+    timeout: float = 10.0
+    retries: int = 2
+    backoff: float = 0.2
+    max_backoff: float = 2.0
+
+    @classmethod
+    def from_env(cls, name: str, base_url: str, **defaults) -> "UpstreamConfig":
+        """Reads ``HTTP_<NAME>_MAX_CONNECTIONS``, ``HTTP_<NAME>_TIMEOUT`` and ``HTTP_<NAME>_RETRIES`` overrides."""
+        prefix = f"HTTP_{name.upper()}_"
+        config = cls(base_url=base_url, **defaults)
+        config.max_connections = int(os.getenv(prefix + "MAX_CONNECTIONS", config.max_connections))
+        config.timeout = float(os.getenv(prefix + "TIMEOUT", config.timeout))
+        config.retries = int(os.getenv(prefix + "RETRIES", config.retries))
+        return config
+
+
+def default_upstreams() -> dict[str, UpstreamConfig]:
+    return {
+        "reniec": UpstreamConfig.from_env("reniec", "https://api.apis.net.pe"),
+        "ipgeolocation": UpstreamConfig.from_env("ipgeolocation", "https://api.ipgeolocation.io"),
+    }
+
+
+class UpstreamStats:
+    __slots__ = ("requests", "retries", "errors", "status_errors", "latency_total", "latency_max")
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.status_errors = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "errors": self.errors,
+            "status_errors": self.status_errors,
+            "latency_avg_ms": round(self.latency_total * 1000 / self.requests, 3) if self.requests else 0.0,
+            "latency_max_ms": round(self.latency_max * 1000, 3),
+        }
+
+
+class OutboundClientRegistry:
+    """
+    One keep-alive ``httpx.AsyncClient`` per upstream, created in ``lifespan``.
+
+    Each upstream gets its own connection limits and timeout. Idempotent
+    requests are retried on connection errors and on 429/502/503/504 with
+    jittered exponential backoff. Pass ``transport`` (e.g. ``httpx.MockTransport``)
+    to run against local fakes.
+    """
+
+    def __init__(
+        self,
+        upstreams: Optional[dict[str, UpstreamConfig]] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.upstreams = upstreams or default_upstreams()
+        self.clients: dict[str, httpx.AsyncClient] = {}
+        self._stats: dict[str, UpstreamStats] = {}
+        for name, config in self.upstreams.items():
+            self.clients[name] = httpx.AsyncClient(
+                base_url=config.base_url,
+                timeout=config.timeout,
+                limits=httpx.Limits(
+                    max_connections=config.max_connections,
+                    max_keepalive_connections=config.max_keepalive_connections,
+                ),
+                http2=HTTP2_AVAILABLE and transport is None,
+                transport=transport,
+            )
+            self._stats[name] = UpstreamStats()
+
+    async def request(self, upstream: str, method: str, url: str, **kwargs) -> httpx.Response:
+        with span("http", upstream):
+            return await self._request(upstream, method, url, **kwargs)
+
+    async def _request(self, upstream: str, method: str, url: str, **kwargs) -> httpx.Response:
+        config = self.upstreams[upstream]
+        client = self.clients[upstream]
+        stats = self._stats[upstream]
+        retries = config.retries if method.upper() in ("GET", "HEAD", "OPTIONS") else 0
+
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            stats.requests += 1
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                stats.errors += 1
+                if attempt >= retries:
+                    raise
+            else:
+                if response.status_code >= 400:
+                    stats.status_errors += 1
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= retries:
+                    return response
+                await response.aclose()
+            finally:
+                elapsed = time.perf_counter() - started
+                stats.latency_total += elapsed
+                stats.latency_max = max(stats.latency_max, elapsed)
+
+            attempt += 1
+            stats.retries += 1
+            # Full jitter keeps retries from different requests from lining up
+            await asyncio.sleep(random.uniform(0, min(config.max_backoff, config.backoff * 2 ** attempt)))
+
+    async def get(self, upstream: str, url: str, **kwargs) -> httpx.Response:
+        return await self.request(upstream, "GET", url, **kwargs)
+
+    def stats(self) -> dict:
+        return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    async def aclose(self):
+        await asyncio.gather(*(client.aclose() for client in self.clients.values()))
+        logger.info("Clientes HTTP salientes cerrados")
+
+
+def get_http_clients(request: Request) -> OutboundClientRegistry:
+    return request.app.state.http_clients
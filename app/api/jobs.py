@@ -0,0 +1,314 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Request, status
+from pydantic import BaseModel
+
+from app.api.cache import cache_key
+from app.api.db.repositories import JobRepository
+from app.api.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timed_out"
+TERMINAL = {SUCCEEDED, FAILED, CANCELLED, TIMED_OUT}
+
+Runner = Callable[[BaseModel], Awaitable[Any]]
+
+
+class Job:
+    __slots__ = (
+        "id", "kind", "payload", "dedup_key", "status", "result", "error", "user_ids",
+        "created_at", "started_at", "finished_at", "deadline", "task", "cancel_requested", "watchers",
+        "finished",
+    )
+
+    def __init__(self, kind: str, payload: BaseModel, dedup_key: str, user_id: str, deadline: float):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.payload = payload
+        self.dedup_key = dedup_key
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.user_ids = {user_id}
+        self.created_at = datetime.utcnow().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.deadline = deadline
+        self.task: Optional[asyncio.Future] = None
+        self.cancel_requested = False
+        self.watchers: set[asyncio.Queue] = set()
+        self.finished = asyncio.Event()
+
+    def snapshot(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Runs long model generations in the background instead of holding the
+    request open.
+
+    ``submit`` returns at once with a queued job; a fixed pool of ``workers``
+    runs jobs with a per-job ``timeout``. Submitting the same input while an
+    identical job is queued or running on this instance returns that job.
+    Every status change is written to the ``jobs`` collection (kept for
+    ``retention`` seconds) so clients can poll any instance, and pushed to
+    local watchers.
+
+    A job is only cancelled once every user that submitted it has cancelled.
+    Timed out and cancelled runners are cancelled and awaited before their
+    worker moves on, so runners must let cancellation reach the model call
+    (e.g. ``ResponseCache.get_or_load(..., cancel_abandoned=True)``) for
+    ``workers`` to bound the generations in progress.
+    """
+
+    def __init__(
+        self,
+        runners: dict[str, Runner],
+        repository: Optional[JobRepository] = None,
+        workers: Optional[int] = None,
+        queue_limit: Optional[int] = None,
+        timeout: Optional[float] = None,
+        retention: Optional[float] = None,
+        max_jobs: Optional[int] = None,
+    ):
+        self.runners = runners
+        self.repository = repository
+        self.workers = workers or int(os.getenv("JOB_WORKERS", "4"))
+        self.queue_limit = queue_limit or int(os.getenv("JOB_QUEUE_LIMIT", "100"))
+        self.timeout = timeout or float(os.getenv("JOB_TIMEOUT", "120"))
+        self.retention = retention or float(os.getenv("JOB_RETENTION", "86400"))
+        self.max_jobs = max_jobs or int(os.getenv("JOB_MEMORY_LIMIT", "1000"))
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_limit)
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._inflight: dict[str, Job] = {}
+        self._workers: list[asyncio.Task] = []
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.completed: dict[str, int] = dict.fromkeys(sorted(TERMINAL), 0)
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for job in list(self._inflight.values()):
+            await self._finish(job, FAILED, error="El servidor se detuvo antes de completar el trabajo")
+
+    def _document(self, job: Job) -> dict:
+        document = job.snapshot()
+        document["_key"] = document.pop("job_id")
+        document["user_ids"] = sorted(job.user_ids)
+        document["deadline"] = job.deadline
+        document["purge_at"] = time.time() + self.retention
+        return document
+
+    async def _update(self, job: Job):
+        snapshot = job.snapshot()
+        for watcher in job.watchers:
+            watcher.put_nowait(snapshot)
+        if self.repository is not None:
+            try:
+                await self.repository.save(self._document(job))
+            except Exception as e:
+                logger.error(f"No se pudo guardar el trabajo {job.id}: {e}")
+
+    def _remember(self, job: Job):
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_jobs:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest.status not in TERMINAL:
+                break
+            del self._jobs[oldest_id]
+
+    async def submit(self, kind: str, payload: BaseModel, user_id: str) -> dict:
+        dedup_key = cache_key(f"job:{kind}", payload.dict())
+        job = self._inflight.get(dedup_key)
+        if job is not None:
+            self.deduplicated += 1
+            job.user_ids.add(user_id)
+            return job.snapshot()
+
+        # Queued jobs count against their own timeout too, so a backlog cannot
+        # leave a client polling forever
+        job = Job(kind, payload, dedup_key, user_id, deadline=time.time() + 2 * self.timeout)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Hay demasiados trabajos en cola, inténtalo nuevamente en unos segundos",
+                headers={"Retry-After": "5"},
+            )
+        self.submitted += 1
+        self._inflight[dedup_key] = job
+        self._remember(job)
+        await self._update(job)
+        return job.snapshot()
+
+    async def _finish(self, job: Job, status_: str, result: Any = None, error: Optional[str] = None):
+        job.status = status_
+        job.result = result
+        job.error = error
+        job.finished_at = datetime.utcnow().isoformat()
+        self.completed[status_] += 1
+        if self._inflight.get(job.dedup_key) is job:
+            del self._inflight[job.dedup_key]
+        job.finished.set()
+        await self._update(job)
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            if job.status != QUEUED:
+                continue
+            if time.time() > job.deadline:
+                await self._finish(job, TIMED_OUT, error="El trabajo esperó demasiado en la cola")
+                continue
+
+            job.status = RUNNING
+            job.started_at = datetime.utcnow().isoformat()
+            job.deadline = time.time() + self.timeout
+            await self._update(job)
+            if job.cancel_requested:
+                # Cancelled while the status was being saved
+                await self._finish(job, CANCELLED)
+                continue
+
+            job.task = asyncio.ensure_future(asyncio.wait_for(self.runners[job.kind](job.payload), timeout=self.timeout))
+            try:
+                result = await job.task
+            except asyncio.CancelledError:
+                if not job.cancel_requested:
+                    # The worker itself is shutting down
+                    job.task.cancel()
+                    raise
+                await self._finish(job, CANCELLED)
+            except asyncio.TimeoutError:
+                await self._finish(job, TIMED_OUT, error=f"El trabajo superó el tiempo máximo de {self.timeout:g} segundos")
+            except HTTPException as e:
+                await self._finish(job, FAILED, error=e.detail)
+            except Exception as e:
+                logger.error(f"Error en el trabajo {job.id} ({job.kind}): {e}")
+                await self._finish(job, FAILED, error=str(e))
+            else:
+                await self._finish(job, SUCCEEDED, result=result)
+
+    async def get(self, job_id: str, user_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.snapshot() if user_id in job.user_ids else None
+
+        if self.repository is None:
+            return None
+        document = await self.repository.get(job_id)
+        if document is None or user_id not in document.get("user_ids", ()):
+            return None
+        snapshot = {key: document.get(key) for key in ("kind", "status", "result", "error", "created_at", "started_at", "finished_at")}
+        snapshot["job_id"] = document["_key"]
+        if snapshot["status"] not in TERMINAL and time.time() > document.get("deadline", 0):
+            # The instance running it went away without recording the outcome
+            snapshot["status"] = FAILED
+            snapshot["error"] = "El trabajo fue interrumpido"
+        return snapshot
+
+    async def cancel(self, job_id: str, user_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            snapshot = await self.get(job_id, user_id)
+            if snapshot is not None and snapshot["status"] not in TERMINAL:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="El trabajo se está ejecutando en otra instancia",
+                )
+            return snapshot
+        if user_id not in job.user_ids:
+            return None
+        if job.status in TERMINAL:
+            return job.snapshot()
+
+        if len(job.user_ids) > 1:
+            # Someone else is still waiting for the same result
+            job.user_ids.discard(user_id)
+            snapshot = job.snapshot()
+            snapshot["status"] = CANCELLED
+            return snapshot
+
+        job.cancel_requested = True
+        if job.status == QUEUED:
+            await self._finish(job, CANCELLED)
+        else:
+            if job.task is not None:
+                job.task.cancel()
+            # The worker records the outcome once the generation has stopped
+            await job.finished.wait()
+        return job.snapshot()
+
+    async def watch(self, job_id: str, user_id: str, keep_alive: float = 15) -> AsyncIterator[Optional[dict]]:
+        """
+        Yields the job's state now and after every change until it finishes.
+        Yields None every ``keep_alive`` seconds without changes.
+        """
+        job = self._jobs.get(job_id)
+        if job is None or user_id not in job.user_ids:
+            snapshot = await self.get(job_id, user_id)
+            if snapshot is not None:
+                yield snapshot
+            return
+
+        watcher: asyncio.Queue = asyncio.Queue()
+        job.watchers.add(watcher)
+        try:
+            snapshot = job.snapshot()
+            yield snapshot
+            while snapshot["status"] not in TERMINAL:
+                try:
+                    snapshot = await asyncio.wait_for(watcher.get(), timeout=keep_alive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield snapshot
+        finally:
+            job.watchers.discard(watcher)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "inflight": len(self._inflight),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "completed": dict(self.completed),
+        }
+
+
+def get_job_manager(request: Request) -> JobManager:
+    return request.app.state.job_manager
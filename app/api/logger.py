@@ -1,15 +1,162 @@
+import atexit
+import json
 import logging
 import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 
 # Global variable to track logger configuration state
 logger_configured = False
 
+_queue_handler = None
+_listener = None
+_listening = False
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line. ``severity`` and ``message`` are the keys
+    Google Cloud Logging reads from structured stdout logs.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "severity": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Samples and rate limits records below WARNING, per logger, before they are
+    queued. Each logger gets a token bucket of ``rate`` records per second
+    with bursts of up to ``burst``. The number of records dropped since the
+    last one that went through is attached to it as ``suppressed``.
+    """
+
+    def __init__(self, rate: float, burst: int, sample_rate: float):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.sample_rate = sample_rate
+        self._buckets: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            bucket = self._buckets.get(record.name)
+            now = time.monotonic()
+            if bucket is None:
+                # [tokens, last refill, suppressed]
+                bucket = self._buckets[record.name] = [float(self.burst), now, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1 or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            record.suppressed, bucket[2] = bucket[2], 0
+        return True
+
+
+class TruncatingQueueHandler(QueueHandler):
+    """
+    Queues records with their message already merged and cut to
+    ``max_length`` characters, so the listener thread never formats large
+    payloads and never touches objects still in use by the request. Records
+    are dropped, not waited on, when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue, max_length: int):
+        super().__init__(log_queue)
+        self.max_length = max_length
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Losing a log line is better than blocking the request on stdout
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        message = record.getMessage()
+        if len(message) > self.max_length:
+            message = f"{message[:self.max_length]}... [{len(message) - self.max_length} caracteres truncados]"
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def _configure():
+    global logger_configured, _queue_handler, _listener
+    max_length = int(os.environ.get("LOG_MAX_MESSAGE_LENGTH", "2000"))
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(maxsize=int(os.environ.get("LOG_QUEUE_SIZE", "10000")))
+    _queue_handler = TruncatingQueueHandler(log_queue, max_length)
+    _queue_handler.addFilter(RateLimitFilter(
+        rate=float(os.environ.get("LOG_RATE_LIMIT", "50")),
+        burst=int(os.environ.get("LOG_RATE_BURST", "100")),
+        sample_rate=float(os.environ.get("LOG_SAMPLE_RATE", "1.0")),
+    ))
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    atexit.register(stop_logging)
+    logger_configured = True
+
+
+def start_logging():
+    """Starts the writer thread if it is not running."""
+    global _listening
+    with _lock:
+        if _listener is not None and not _listening:
+            _listener.start()
+            _listening = True
+
+
+def stop_logging():
+    """Flushes the queued records and stops the writer thread."""
+    global _listening
+    with _lock:
+        if _listener is not None and _listening:
+            _listener.stop()
+            _listening = False
+
+
 def setup_logger(name=__name__):
     """
     Sets up a logger based on the environment.
 
-    If the environment variable ENV_TYPE is set to 'sandbox' or 'production', it configures
-    Google Cloud Logging. Otherwise, it uses the standard logging.
+    Records are handed to a queue and written as JSON lines to stdout by a
+    background thread, so request handlers never block on the stream. The
+    level comes from LOG_LEVEL (INFO by default); records below WARNING are
+    sampled (LOG_SAMPLE_RATE) and rate limited per logger (LOG_RATE_LIMIT,
+    LOG_RATE_BURST), and messages are cut to LOG_MAX_MESSAGE_LENGTH.
 
     Parameters:
     name (str): The name of the logger.
@@ -17,20 +164,19 @@ def setup_logger(name=__name__):
     Returns:
     logging.Logger: Configured logger.
     """
-    global logger_configured
-    env_type = os.environ.get('ENV_TYPE', 'undefined')
-    project = os.environ.get('PROJECT_ID', 'undefined')
+    with _lock:
+        if not logger_configured:
+            _configure()
+    start_logging()
 
     # Obtain a reference to the logger
     logger = logging.getLogger(name)
-    
+
     # Check if the logger is already configured
     if not logger.handlers:
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        logger.setLevel(logging.DEBUG)
-        logger.propagate = True
-
-    return logger
\ No newline at end of file
+        logger.addHandler(_queue_handler)
+        logger.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+        # Records are written once here, not again by uvicorn's root handlers
+        logger.propagate = False
+
+    return logger
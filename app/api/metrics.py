@@ -0,0 +1,181 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Iterable
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: one count per bucket plus +Inf, then the sum
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for labels, series in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames + ("le",), labels + (str(bound),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {series[-1]}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    In-process metrics in the Prometheus text format.
+
+    Metrics are plain dict updates made from the event loop, so recording one
+    costs about as much as a dict lookup. Values are per process.
+    """
+
+    def __init__(self):
+        self._metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+http_requests = metrics.register(Counter(
+    "http_requests_total", "HTTP requests by route and status code.", ("method", "route", "status")))
+http_request_duration = metrics.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")))
+http_requests_in_flight = metrics.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served.", ("method",)))
+span_duration = metrics.register(Histogram(
+    "span_duration_seconds", "Duration of database, outbound HTTP, bcrypt and LLM calls.", ("kind", "name")))
+span_errors = metrics.register(Counter(
+    "span_errors_total", "Failed database, outbound HTTP, bcrypt and LLM calls.", ("kind", "name")))
+llm_tokens = metrics.register(Counter(
+    "llm_tokens_total", "LLM tokens by model and direction.", ("model", "type")))
+
+
+@contextmanager
+def span(kind: str, name: str):
+    """Records the duration of the block, and whether it raised, as a ``kind``/``name`` span."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        span_errors.inc(kind, name)
+        raise
+    finally:
+        span_duration.observe(time.perf_counter() - started, kind, name)
+
+
+def record_llm_tokens(model: str, prompt_tokens: int, completion_tokens: int):
+    if prompt_tokens:
+        llm_tokens.inc(model, "prompt", amount=prompt_tokens)
+    if completion_tokens:
+        llm_tokens.inc(model, "completion", amount=completion_tokens)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and status codes per route template
+    (``/messages/{district}``, not the concrete path, so the number of series
+    stays bounded) and the number of requests in flight.
+
+    The route is only known once the router has matched it, so in-flight
+    requests are counted per method.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec(method)
+            route = scope.get("route")
+            route_path = getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe(time.perf_counter() - started, method, route_path)
+            http_requests.inc(method, route_path, str(status_code))
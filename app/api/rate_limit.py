@@ -0,0 +1,161 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request, status
+
+from app.api.auth.auth import TokenClaims, get_current_user
+from app.api.metrics import Counter, metrics
+
+UNITS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Requests allowed per user, per district and for everyone together on each
+# model-backed route
+DEFAULT_LIMITS = {
+    "chat": {"user": "20/minute", "district": "300/minute", "global": "600/minute"},
+    "security_plan": {"user": "5/minute", "district": "60/minute", "global": "120/minute"},
+    "info_agent": {"user": "5/minute", "district": "60/minute", "global": "120/minute"},
+}
+
+rate_limit_rejections = metrics.register(Counter(
+    "rate_limit_rejections_total", "Requests rejected by the rate limiter.", ("route", "scope")))
+
+
+class RateLimit:
+    __slots__ = ("rate", "burst")
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+
+    @classmethod
+    def parse(cls, value: str) -> Optional["RateLimit"]:
+        """Parses ``"20/minute"`` or ``"20/minute;burst=5"``; ``"off"`` or ``"0"`` disables the limit."""
+        value = value.strip().lower()
+        if value in ("", "0", "off", "none"):
+            return None
+        spec, _, burst = value.partition(";burst=")
+        count, _, unit = spec.partition("/")
+        count = float(count)
+        return cls(rate=count / UNITS[unit or "second"], burst=int(burst or max(1, count)))
+
+
+class RateLimitBackend:
+    """Interface for token bucket stores (e.g. one shared by every instance)."""
+
+    async def consume(self, key: str, limit: RateLimit) -> float:
+        """Takes one token from ``key``. Returns 0 if allowed, else the seconds until a token is available."""
+        raise NotImplementedError
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """
+    Token buckets in process memory. Buckets beyond ``max_keys`` are evicted
+    least recently used first, which only ever makes the limiter more lenient.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, list] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: RateLimit) -> float:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                # [tokens, last refill]
+                bucket = self._buckets[key] = [float(limit.burst), now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(limit.burst, bucket[0] + (now - bucket[1]) * limit.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / limit.rate
+
+    async def consume(self, key: str, limit: RateLimit) -> float:
+        return self.take(key, limit)
+
+
+class RateLimiter:
+    """
+    Per-route token bucket limits on the caller's ``user_id``, on their
+    district and on the route as a whole.
+
+    Limits come from ``RATE_LIMIT_<ROUTE>_<SCOPE>`` (e.g.
+    ``RATE_LIMIT_CHAT_USER=20/minute``), falling back to ``DEFAULT_LIMITS``.
+    Scopes are checked from the narrowest, so a user over their own limit
+    does not spend tokens of their district or of everyone else.
+    """
+
+    SCOPES = ("user", "district", "global")
+
+    def __init__(self, backend: Optional[RateLimitBackend] = None, limits: Optional[dict] = None):
+        self.backend = backend or InMemoryRateLimitBackend(int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")))
+        self.limits: dict[str, dict[str, RateLimit]] = {}
+        for route, defaults in (limits or DEFAULT_LIMITS).items():
+            self.limits[route] = {}
+            for scope in self.SCOPES:
+                value = os.getenv(f"RATE_LIMIT_{route.upper()}_{scope.upper()}", defaults.get(scope, "off"))
+                limit = RateLimit.parse(value)
+                if limit is not None:
+                    self.limits[route][scope] = limit
+        self.allowed = 0
+        self.rejected = 0
+
+    async def check(self, route: str, user_id: str, district: Optional[str]) -> tuple[Optional[str], float]:
+        """Returns ``(None, 0)`` if the request may go ahead, else the exhausted scope and its retry delay."""
+        for scope, limit in self.limits.get(route, {}).items():
+            if scope == "user":
+                key = f"{route}:user:{user_id}"
+            elif scope == "district":
+                if not district:
+                    continue
+                key = f"{route}:district:{district.lower()}"
+            else:
+                key = f"{route}:global"
+            retry_after = await self.backend.consume(key, limit)
+            if retry_after > 0:
+                self.rejected += 1
+                rate_limit_rejections.inc(route, scope)
+                return scope, retry_after
+        self.allowed += 1
+        return None, 0.0
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+
+def get_rate_limiter(request: Request) -> RateLimiter:
+    return request.app.state.rate_limiter
+
+
+def rate_limit(route: str):
+    """
+    Dependency rejecting the request with a 429 and ``Retry-After`` when the
+    caller is over one of ``route``'s limits, before any model work starts.
+    """
+    async def dependency(
+        token_data: TokenClaims = Depends(get_current_user),
+        limiter: RateLimiter = Depends(get_rate_limiter)
+    ):
+        scope, retry_after = await limiter.check(route, token_data.user_id, token_data.district)
+        if scope is not None:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Has excedido el límite de solicitudes, inténtalo nuevamente en unos segundos",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    return dependency
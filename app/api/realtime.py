@@ -0,0 +1,323 @@
+import asyncio
+import itertools
+import os
+import time
+from collections import deque
+from typing import Optional
+
+from fastapi import Request
+
+from app.api.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+CLOSE_PRIORITY = -1
+ALERT_PRIORITY = 0
+MESSAGE_PRIORITY = 1
+NEIGHBOUR_ALERT_PRIORITY = 1
+
+
+class LatencyStats:
+    """Count, average, maximum and percentiles over the most recent samples."""
+
+    def __init__(self, window: int = 1024):
+        self._samples: deque = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> dict:
+        samples = sorted(self._samples)
+        percentile = lambda p: round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 3) if samples else 0.0
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+        }
+
+
+class Subscriber:
+    """
+    Push queue of one connected client.
+
+    Alerts are queued ahead of regular messages. Regular messages are dropped
+    once ``max_pending`` items are waiting. Alerts are always queued unless
+    ``alert_limit`` items are already waiting; a client that far behind is
+    closed so it reconnects and catches up with a fresh read.
+    """
+
+    _sequence = itertools.count()
+
+    def __init__(self, district: str, max_pending: int, alert_limit: Optional[int] = None, alert_latency: Optional[LatencyStats] = None):
+        self.district = district
+        self.max_pending = max_pending
+        self.alert_limit = alert_limit or max_pending * 2
+        self.alert_latency = alert_latency
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self.dropped = 0
+        self.closed = False
+
+    def offer(self, message: dict, dispatched_at: Optional[float] = None) -> bool:
+        if self.closed:
+            return False
+        is_alert = bool(message.get("is_alert"))
+        pending = self.queue.qsize()
+        if is_alert and pending >= self.alert_limit:
+            self.close()
+            return False
+        if not is_alert and pending >= self.max_pending:
+            self.dropped += 1
+            return False
+        priority = ALERT_PRIORITY if is_alert else MESSAGE_PRIORITY
+        # The sequence keeps FIFO order within a priority and avoids comparing dicts
+        self.queue.put_nowait((priority, next(self._sequence), message, dispatched_at))
+        return True
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.queue.put_nowait((CLOSE_PRIORITY, next(self._sequence), None, None))
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Returns the next message, or None on timeout or once the subscriber is closed."""
+        try:
+            _, _, message, dispatched_at = await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        if dispatched_at is not None and self.alert_latency is not None:
+            self.alert_latency.observe(time.monotonic() - dispatched_at)
+        return message
+
+
+class AlertJob:
+    __slots__ = ("district", "message", "dispatched_at")
+
+    def __init__(self, district: str, message: dict, dispatched_at: float):
+        self.district = district
+        self.message = message
+        self.dispatched_at = dispatched_at
+
+
+class AlertDispatcher:
+    """
+    Fans alerts out to subscribers from a background worker.
+
+    ``dispatch`` queues one job for the alert's district and, with
+    ``notify_neighbours``, one lower-priority job for every other district of
+    the same province that has subscribers. The worker hands each job to
+    subscribers in batches of ``batch_size``, yielding to the event loop
+    between batches so a district with thousands of clients does not stall
+    other requests.
+
+    Latency is measured from ``dispatch`` to the worker picking the job up,
+    to the last subscriber of the job being queued, and to each client's
+    stream actually taking the alert.
+    """
+
+    def __init__(self, hub: "DistrictMessageHub", batch_size: Optional[int] = None, notify_neighbours: Optional[bool] = None):
+        self.hub = hub
+        self.batch_size = batch_size or int(os.getenv("ALERT_BATCH_SIZE", "500"))
+        if notify_neighbours is None:
+            notify_neighbours = os.getenv("ALERT_NOTIFY_NEIGHBOURS", "true").lower() == "true"
+        self.notify_neighbours = notify_neighbours
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._worker: Optional[asyncio.Task] = None
+        self.jobs = 0
+        self.deliveries = 0
+        self.evicted = 0
+        self.queue_delay = LatencyStats()
+        self.fanout_latency = LatencyStats()
+        self.delivery_latency = LatencyStats()
+
+    def start(self):
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def dispatch(self, message: dict):
+        district = message["district"]
+        dispatched_at = time.monotonic()
+        jobs = [(ALERT_PRIORITY, AlertJob(district, message, dispatched_at))]
+        province = message.get("province")
+        if self.notify_neighbours and province:
+            jobs.extend(
+                (NEIGHBOUR_ALERT_PRIORITY, AlertJob(neighbour, message, dispatched_at))
+                for neighbour in self.hub.neighbours(district, province)
+            )
+        for priority, job in jobs:
+            self.jobs += 1
+            if self._worker is None:
+                # No worker outside the app lifespan, deliver right away
+                self._deliver(job, list(self.hub.subscribers(job.district)))
+            else:
+                self._queue.put_nowait((priority, next(self._sequence), job))
+
+    def _deliver(self, job: AlertJob, subscribers: list[Subscriber]):
+        for subscriber in subscribers:
+            if subscriber.offer(job.message, job.dispatched_at):
+                self.deliveries += 1
+            elif subscriber.closed:
+                self.evicted += 1
+                self.hub.unsubscribe(subscriber)
+
+    async def _run(self):
+        while True:
+            _, _, job = await self._queue.get()
+            try:
+                self.queue_delay.observe(time.monotonic() - job.dispatched_at)
+                subscribers = list(self.hub.subscribers(job.district))
+                for start in range(0, len(subscribers), self.batch_size):
+                    self._deliver(job, subscribers[start:start + self.batch_size])
+                    await asyncio.sleep(0)
+                self.fanout_latency.observe(time.monotonic() - job.dispatched_at)
+            except Exception as e:
+                logger.error(f"Error al distribuir la alerta del distrito {job.district}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "jobs": self.jobs,
+            "deliveries": self.deliveries,
+            "evicted": self.evicted,
+            "queue_delay": self.queue_delay.as_dict(),
+            "fanout_latency": self.fanout_latency.as_dict(),
+            "delivery_latency": self.delivery_latency.as_dict(),
+        }
+
+
+class DistrictMessageHub:
+    """
+    Keeps the most recent messages of each district in memory and pushes new
+    ones to subscribers.
+
+    ``publish`` is called on every write. A district's buffer only answers
+    reads after a cold read from Arango has primed it, and for at most
+    ``buffer_ttl`` seconds after that, so writes that landed on other
+    instances show up after a short delay.
+
+    Alerts are pushed through ``alerts``, an ``AlertDispatcher``, which also
+    reaches subscribers of neighbouring districts.
+    """
+
+    def __init__(self, buffer_size: Optional[int] = None, buffer_ttl: Optional[float] = None, max_pending: Optional[int] = None):
+        self.buffer_size = buffer_size or int(os.getenv("MESSAGE_BUFFER_SIZE", "50"))
+        self.buffer_ttl = buffer_ttl if buffer_ttl is not None else float(os.getenv("MESSAGE_BUFFER_TTL", "10"))
+        self.max_pending = max_pending or int(os.getenv("SUBSCRIBER_MAX_PENDING", "100"))
+        self._buffers: dict[str, deque] = {}
+        self._primed_at: dict[str, float] = {}
+        self._subscribers: dict[str, set[Subscriber]] = {}
+        self._provinces: dict[str, str] = {}
+        self.alerts = AlertDispatcher(self)
+        self.hits = 0
+        self.misses = 0
+        self.published = 0
+
+    def recent(self, district: str, limit: int) -> Optional[list[dict]]:
+        """Returns the last ``limit`` messages oldest first, or None if the buffer cannot answer."""
+        primed_at = self._primed_at.get(district)
+        if primed_at is None or time.monotonic() - primed_at > self.buffer_ttl or limit > self.buffer_size:
+            self.misses += 1
+            return None
+        self.hits += 1
+        buffer = self._buffers[district]
+        return list(buffer)[-limit:] if limit else []
+
+    def prime(self, district: str, messages: list[dict]):
+        """Fills the buffer from a cold read, keeping messages published while the read was running."""
+        merged = {message["order"]: message for message in messages}
+        for message in self._buffers.get(district, ()):
+            merged.setdefault(message["order"], message)
+        latest = [merged[order] for order in sorted(merged)][-self.buffer_size:]
+        self._buffers[district] = deque(latest, maxlen=self.buffer_size)
+        self._primed_at[district] = time.monotonic()
+        if latest and latest[-1].get("province"):
+            self._provinces[district] = latest[-1]["province"]
+
+    @staticmethod
+    def _insert(buffer: deque, message: dict):
+        """
+        Inserts ``message`` by ``order``. Concurrent writes can finish out of
+        order, so it is placed after the last older message instead of
+        appended; scanning from the end is cheap as it usually is the newest.
+        """
+        order = message.get("order")
+        index = len(buffer)
+        if order is not None:
+            while index > 0 and buffer[index - 1].get("order", 0) > order:
+                index -= 1
+        if len(buffer) == buffer.maxlen:
+            if index == 0:
+                # Older than every message the buffer keeps
+                return
+            buffer.popleft()
+            index -= 1
+        buffer.insert(index, message)
+
+    def publish(self, message: dict):
+        district = message["district"]
+        buffer = self._buffers.setdefault(district, deque(maxlen=self.buffer_size))
+        self._insert(buffer, message)
+        if message.get("province"):
+            self._provinces[district] = message["province"]
+        self.published += 1
+        if message.get("is_alert"):
+            self.alerts.dispatch(message)
+            return
+        for subscriber in self._subscribers.get(district, ()):
+            subscriber.offer(message)
+
+    def subscribe(self, district: str, province: Optional[str] = None) -> Subscriber:
+        subscriber = Subscriber(district, self.max_pending, alert_latency=self.alerts.delivery_latency)
+        self._subscribers.setdefault(district, set()).add(subscriber)
+        if province:
+            self._provinces.setdefault(district, province)
+        return subscriber
+
+    def subscribers(self, district: str) -> set[Subscriber]:
+        return self._subscribers.get(district, set())
+
+    def neighbours(self, district: str, province: str) -> list[str]:
+        """Other districts of ``province`` that currently have subscribers."""
+        return [
+            other for other in self._subscribers
+            if other != district and self._provinces.get(other) == province
+        ]
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self._subscribers.get(subscriber.district)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.district]
+
+    def stats(self) -> dict:
+        return {
+            "districts": len(self._buffers),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "published": self.published,
+            "alerts": self.alerts.stats(),
+        }
+
+
+def get_message_hub(request: Request) -> DistrictMessageHub:
+    return request.app.state.message_hub
@@ -1,27 +1,52 @@
+import asyncio
 from datetime import date
-from http.client import HTTPException
+import json
 import uuid
+from typing import Optional
 from dotenv import find_dotenv, load_dotenv
-from fastapi import APIRouter, Depends, status, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Request
+from fastapi.responses import PlainTextResponse
 import httpx
-from app.api.features.chatbot import chatbot_executor
-from app.api.features.info_agent import generate_info_agent_results
-from app.api.features.security_plan import compile_security_plan_chain
+from app.api.features.chatbot import chatbot_executor, stream_chatbot_executor
+from app.api.features.chat_context import chat_context
+from app.api.features.structured_output import StructuredOutputError
+from app.api.features.info_agent import generate_info_agent_results, info_cache, info_output, info_prewarmer
+from app.api.features.security_plan import generate_security_plan, plan_cache, plan_output, stream_security_plan
+from app.api.features.concurrency import provider_stats
 from app.api.logger import setup_logger
 from app.api.auth.auth import (
     GeolocationArgs,
     RegisterUser,
     Token,
+    TokenClaims,
     User,
     create_access_token,
     get_current_user, 
     key_check,
-    return_db_instance
+    token_cache
 )
-from passlib.hash import bcrypt
+from app.api.db.connection import ArangoConnectionManager, get_db_manager
+from app.api.db.schema import INDEX_NAMES
+from app.api.db.repositories import (
+    DuplicateUserError,
+    MessageRepository,
+    UserRepository,
+    get_message_repository,
+    get_user_repository
+)
+from app.api.auth.passwords import PasswordHasher, get_password_hasher
+from app.api.http_clients import OutboundClientRegistry, get_http_clients
+from app.api.sse import event_stream_response, sse_event
+from app.api.realtime import DistrictMessageHub, get_message_hub
+from app.api.upstream_lookups import UpstreamLookups, get_upstream_lookups
+from app.api.client_ip import client_ip
+from app.api.metrics import metrics
+from app.api.rate_limit import RateLimiter, get_rate_limiter, rate_limit
+from app.api.jobs import SUCCEEDED, TERMINAL, JobManager, get_job_manager
 import os
-from app.api.schemas.info_agent_schemas import InfoAgentArgs
-from app.api.schemas.message_schema import MessageZoneChat
+from app.api.schemas.info_agent_schemas import InfoAgentArgs, InfoAgentPrewarmArgs
+from app.api.schemas.message_schema import MessageBatchRequest, MessageZoneChat
+from pydantic import ValidationError
 from app.api.schemas.schemas import ChatRequest, ChatResponse, Message
 from app.api.schemas.security_plan_schemas import SecurityPlanInput
 
@@ -34,51 +59,102 @@ load_dotenv(find_dotenv())
 def read_root():
     return {"Hello": "World"}
 
-APIS_PE_TOKEN = os.getenv("APIS_PE_TOKEN")
+@router.get("/health")
+def health(
+    manager: ArangoConnectionManager = Depends(get_db_manager),
+    hasher: PasswordHasher = Depends(get_password_hasher),
+    http_clients: OutboundClientRegistry = Depends(get_http_clients),
+    hub: DistrictMessageHub = Depends(get_message_hub),
+    lookups: UpstreamLookups = Depends(get_upstream_lookups),
+    limiter: RateLimiter = Depends(get_rate_limiter),
+    jobs: JobManager = Depends(get_job_manager)
+):
+    database = manager.health()
+    database["missing_indexes"] = sorted(INDEX_NAMES - manager.verified_indexes)
+    return {
+        "status": database["status"],
+        "database": database,
+        "password_hasher": hasher.stats(),
+        "upstreams": http_clients.stats(),
+        "llm_providers": provider_stats(),
+        "caches": {
+            "security_plan": plan_cache.stats(),
+            "info_agent": info_cache.stats(),
+            **lookups.stats()
+        },
+        "info_agent_prewarm": info_prewarmer.stats(),
+        "message_hub": hub.stats(),
+        "token_cache": token_cache.stats(),
+        "chat_context": chat_context.stats(),
+        "structured_output": {
+            "security_plan": plan_output.stats(),
+            "info_agent": info_output.stats()
+        },
+        "rate_limiter": limiter.stats(),
+        "jobs": jobs.stats()
+    }
 
-@router.post("/user/register", response_model=Token)
-async def register(user: RegisterUser):
-    db = return_db_instance()
-    
-    if db["users"].find({"email": user.email}).count() > 0:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El correo ya está registrado",
-        )
+@router.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
+MESSAGE_PAGE_MAX = int(os.getenv("MESSAGE_PAGE_MAX", "100"))
+BULK_MAX_MESSAGES = int(os.getenv("BULK_MAX_MESSAGES", "5000"))
+BULK_INSERT_CHUNK_SIZE = int(os.getenv("BULK_INSERT_CHUNK_SIZE", "500"))
+
+async def gather_or_cancel(*aws):
+    """
+    Runs ``aws`` concurrently and returns their results in order. The first
+    failure cancels the others and is re-raised.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
     try:
-        async with httpx.AsyncClient() as client:
-            dni_response = await client.get(
-                f"https://api.apis.net.pe/v2/reniec/dni?numero={user.dni}",
-                headers={"Authorization": f"Bearer {APIS_PE_TOKEN}", "Accept": "application/json"}
-            )
-            dni_response.raise_for_status()
-            dni_data = dni_response.json()
-            numero_documento = dni_data.get("numeroDocumento")
-
-            if numero_documento != user.dni:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="El DNI proporcionado no es válido o no coincide con la información registrada en RENIEC."
-                )
-    except httpx.RequestError as e:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+        return [task.result() for task in tasks]
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def validate_dni(dni: str, lookups: UpstreamLookups):
+    try:
+        dni_data = await lookups.reniec_dni(dni)
+    except httpx.HTTPError as e:
+        logger.warning(f"Error al consultar RENIEC: {e!r}")
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail="Error al validar el DNI con el servicio de RENIEC."
         )
 
-    try:
-        async with httpx.AsyncClient() as client:
-            ip_response = await client.get("https://api.ipify.org?format=json")
-            ip_response.raise_for_status()
-            ip_signup = ip_response.json().get("ip")
-    except httpx.RequestError:
-        ip_signup = "No disponible"
-
-    hashed_password = bcrypt.hash(user.password)
+    numero_documento = dni_data.get("numeroDocumento") if dni_data else None
+    if numero_documento != dni:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El DNI proporcionado no es válido o no coincide con la información registrada en RENIEC."
+        )
+
+@router.post("/user/register", response_model=Token)
+async def register(
+    user: RegisterUser,
+    request: Request,
+    users: UserRepository = Depends(get_user_repository),
+    hasher: PasswordHasher = Depends(get_password_hasher),
+    lookups: UpstreamLookups = Depends(get_upstream_lookups)
+):
+    ip_signup = client_ip(request)
+
+    # The RENIEC check and the bcrypt hash are independent, a failed check
+    # cancels the hash
+    _, hashed_password = await gather_or_cancel(
+        validate_dni(user.dni, lookups),
+        hasher.hash(user.password)
+    )
+
     user_id = str(uuid.uuid4())
 
-    db["users"].insert({
+    new_user = {
         "_key": user_id,
         "dni": user.dni,
         "firstName": user.firstName,
@@ -94,7 +170,16 @@ async def register(user: RegisterUser):
         "termsAccepted": user.termsAccepted,
         "ipSignup": ip_signup,
         "signupDate": date.today().isoformat()
-    })
+    }
+
+    # The unique indexes on email and dni reject duplicates on insert
+    try:
+        await users.insert(new_user)
+    except DuplicateUserError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El correo ya está registrado" if e.field == "email" else "El DNI ya está registrado",
+        )
 
     access_token = create_access_token(data={
         "user_id": user_id,
@@ -110,15 +195,20 @@ async def register(user: RegisterUser):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/user/login", response_model=Token)
-async def login(user: User):
-    db = return_db_instance()
-    db_user = db["users"].find({"email": user.email}).next()
-    if not db_user or not bcrypt.verify(user.password, db_user["password"]):
+async def login(user: User, users: UserRepository = Depends(get_user_repository), hasher: PasswordHasher = Depends(get_password_hasher)):
+    db_user = await users.find_by_email(user.email)
+    valid, new_hash = (False, None)
+    if db_user:
+        valid, new_hash = await hasher.verify_and_update(user.password, db_user["password"])
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Correo o contraseña incorrecta",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Transparently upgrade hashes created with a different cost factor
+        await users.update_password(db_user["_key"], new_hash)
     access_token = create_access_token(data={"user_id": db_user["_key"], 
                                              "email": db_user["email"], 
                                              "first_name": db_user["firstName"], 
@@ -129,13 +219,13 @@ async def login(user: User):
                                              "ip_signup": db_user["ipSignup"]})
     return {"access_token": access_token, "token_type": "bearer"}
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, token_data: dict = Depends(get_current_user)):
+@router.post("/chat", response_model=ChatResponse, dependencies=[Depends(rate_limit("chat"))])
+async def chat(request: ChatRequest, token_data: TokenClaims = Depends(get_current_user)):
     user_name = request.user.fullName
     chat_messages = request.messages
     user_query = chat_messages[-1].payload.text
 
-    response = chatbot_executor(user_name=user_name, user_query=user_query, messages=chat_messages)
+    response = await chatbot_executor(user_name=user_name, user_query=user_query, messages=chat_messages)
 
     formatted_response = Message(
         role="ai",
@@ -145,89 +235,355 @@ async def chat(request: ChatRequest, token_data: dict = Depends(get_current_user
 
     return ChatResponse(data=[formatted_response])
 
-@router.post("/security-plan")
-async def security_plan( data: SecurityPlanInput, token_data: dict = Depends(get_current_user)):
+@router.post("/chat/stream", dependencies=[Depends(rate_limit("chat"))])
+async def chat_stream(request: ChatRequest, http_request: Request, token_data: TokenClaims = Depends(get_current_user)):
+    """
+    Streams the answer as Server-Sent Events: one ``token`` event per chunk and
+    a final ``message`` event carrying the complete ``Message``.
+    """
+    user_name = request.user.fullName
+    chat_messages = request.messages
+    user_query = chat_messages[-1].payload.text
 
-    chain = compile_security_plan_chain()
+    async def events():
+        chunks = []
+        generation = stream_chatbot_executor(user_name=user_name, user_query=user_query, messages=chat_messages)
+        try:
+            async for chunk in generation:
+                chunks.append(chunk)
+                yield sse_event("token", {"text": chunk})
+        except HTTPException as e:
+            yield sse_event("error", {"status": e.status_code, "message": e.detail})
+            return
+        finally:
+            await generation.aclose()
 
-    result = chain.invoke({
-        "department": data.department,
-        "province": data.province,
-        "district": data.district,
-        "mainTopic": data.mainTopic,
-        "additionalDescription": data.additionalDescription
-    })
+        formatted_response = Message(
+            role="ai",
+            type="text",
+            payload={"text": "".join(chunks)}
+        )
+        yield sse_event("message", formatted_response.dict())
 
-    return result
+    return event_stream_response(http_request, events())
+
+@router.post("/security-plan", dependencies=[Depends(rate_limit("security_plan"))])
+async def security_plan( data: SecurityPlanInput, token_data: TokenClaims = Depends(get_current_user)):
+
+    return await generate_security_plan(data)
+
+@router.post("/security-plan/stream", dependencies=[Depends(rate_limit("security_plan"))])
+async def security_plan_stream(data: SecurityPlanInput, http_request: Request, token_data: TokenClaims = Depends(get_current_user)):
+    """
+    Streams the plan as Server-Sent Events: one ``item`` event per risk, role,
+    asset, procedure, training or policy as soon as it is written, and a final
+    ``plan`` event carrying the complete validated plan.
+    """
+    async def events():
+        generation = stream_security_plan(data)
+        try:
+            async for event, payload in generation:
+                yield sse_event(event, payload)
+        except HTTPException as e:
+            yield sse_event("error", {"status": e.status_code, "message": e.detail})
+        except StructuredOutputError as e:
+            yield sse_event("error", {"status": status.HTTP_502_BAD_GATEWAY, "message": str(e)})
+        finally:
+            await generation.aclose()
 
-@router.post("/info-agent")
-async def security_plan( data: InfoAgentArgs, token_data: dict = Depends(get_current_user)):
+    return event_stream_response(http_request, events())
 
-    result = generate_info_agent_results(data)
+@router.post("/info-agent", dependencies=[Depends(rate_limit("info_agent"))])
+async def security_plan( data: InfoAgentArgs, token_data: TokenClaims = Depends(get_current_user)):
+
+    result = await generate_info_agent_results(data)
 
     return result
 
-@router.post("/geolocation-info")
-async def obtain_geolocation_info(data: GeolocationArgs, token_data: dict = Depends(get_current_user)):
-    api_key = os.getenv("IP_GEOLOCATION_API_KEY") 
-    url = f"https://api.ipgeolocation.io/ipgeo?apiKey={api_key}&ip={data.ip_signup}"
+@router.post("/jobs/security-plan", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(rate_limit("security_plan"))])
+async def submit_security_plan_job(data: SecurityPlanInput, token_data: TokenClaims = Depends(get_current_user), jobs: JobManager = Depends(get_job_manager)):
+    return await jobs.submit("security_plan", data, token_data.user_id)
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url)
-            response.raise_for_status() 
-            return response.json()  
-        except httpx.HTTPStatusError as e:
-            print(f"Error en la solicitud: {e}")
-            return None
-        except httpx.RequestError as e:
-            print(f"Error de conexión: {e}")
-            return None
+@router.post("/jobs/info-agent", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(rate_limit("info_agent"))])
+async def submit_info_agent_job(data: InfoAgentArgs, token_data: TokenClaims = Depends(get_current_user), jobs: JobManager = Depends(get_job_manager)):
+    return await jobs.submit("info_agent", data, token_data.user_id)
 
-@router.post("/messages", status_code=status.HTTP_201_CREATED)
-async def save_message(message: MessageZoneChat, token_data: dict = Depends(get_current_user)):
-    db = return_db_instance()
-    messages_collection = db.collection("messages")
-    last_message = db.aql.execute(
-        """
-        FOR msg IN messages
-            FILTER msg.district == @district
-            SORT msg.order DESC
-            LIMIT 1
-            RETURN msg.order
-        """,
-        bind_vars={"district": message.district}
-    )
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, token_data: TokenClaims = Depends(get_current_user), jobs: JobManager = Depends(get_job_manager)):
+    job = await jobs.get(job_id, token_data.user_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Trabajo no encontrado")
+    return job
 
-    last_order = next(last_message, 0)  
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, token_data: TokenClaims = Depends(get_current_user), jobs: JobManager = Depends(get_job_manager)):
+    job = await jobs.cancel(job_id, token_data.user_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Trabajo no encontrado")
+    return job
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str, request: Request, token_data: TokenClaims = Depends(get_current_user), jobs: JobManager = Depends(get_job_manager)):
+    """
+    Pushes the job's ``status`` as Server-Sent Events on every change and ends
+    with a ``result`` or ``error`` event once it finishes.
+    """
+    job = await jobs.get(job_id, token_data.user_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Trabajo no encontrado")
+
+    async def events():
+        async for snapshot in jobs.watch(job_id, token_data.user_id):
+            if snapshot is None:
+                # Comment frame, keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+            elif snapshot["status"] not in TERMINAL:
+                yield sse_event("status", snapshot)
+            else:
+                yield sse_event("result" if snapshot["status"] == SUCCEEDED else "error", snapshot)
+
+    return event_stream_response(request, events())
+
+@router.post("/admin/info-agent/prewarm", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(key_check)])
+async def prewarm_info_agent_cache(data: InfoAgentPrewarmArgs):
+    scheduled = info_prewarmer.schedule(data.locations)
+    return {"scheduled": scheduled, "skipped": len(data.locations) - scheduled}
+
+@router.post("/geolocation-info")
+async def obtain_geolocation_info(data: GeolocationArgs, token_data: TokenClaims = Depends(get_current_user), lookups: UpstreamLookups = Depends(get_upstream_lookups)):
+    try:
+        return await lookups.ip_geolocation(data.ip_signup)
+    except httpx.HTTPStatusError as e:
+        logger.warning(f"Error en la solicitud: {e}")
+        return None
+    except httpx.RequestError as e:
+        logger.warning(f"Error de conexión: {e}")
+        return None
+
+@router.post("/messages", status_code=status.HTTP_201_CREATED)
+async def save_message(
+    message: MessageZoneChat,
+    token_data: TokenClaims = Depends(get_current_user),
+    messages: MessageRepository = Depends(get_message_repository),
+    hub: DistrictMessageHub = Depends(get_message_hub)
+):
     message_data = message.dict()
-    message_data["order"] = last_order + 1  
     message_data["created_at"] = message_data["created_at"].isoformat()
-    message_data["updated_at"] = message_data.get("updated_at", None)
+    message_data["updated_at"] = message.updated_at.isoformat() if message.updated_at else None
 
     try:
-        messages_collection.insert(message_data)
-        return {"message": "Mensaje guardado con éxito", "data": message_data}
+        saved = await messages.insert_next(message_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al guardar el mensaje: {str(e)}")
+
+    hub.publish(saved)
+    data = {key: value for key, value in saved.items() if not key.startswith("_")}
+    return {"message": "Mensaje guardado con éxito", "data": data}
     
-@router.get("/messages/{district}", status_code=status.HTTP_200_OK)
-async def get_last_six_messages(district: str, token_data: dict = Depends(get_current_user)):
+async def read_bulk_items(request: Request) -> list:
+    """Reads a JSON array or, for ``application/x-ndjson``, one JSON object per line."""
+    if "ndjson" not in request.headers.get("content-type", ""):
+        items = json.loads(await request.body())
+        if not isinstance(items, list):
+            raise ValueError("Se esperaba una lista de mensajes")
+        return items
+
+    items = []
+    pending = b""
+    async for chunk in request.stream():
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        items.extend(json.loads(line) for line in lines if line.strip())
+        if len(items) > BULK_MAX_MESSAGES:
+            break
+    if pending.strip():
+        items.append(json.loads(pending))
+    return items
+
+@router.post("/messages/bulk", status_code=status.HTTP_200_OK)
+async def save_messages_bulk(
+    request: Request,
+    token_data: TokenClaims = Depends(get_current_user),
+    messages: MessageRepository = Depends(get_message_repository),
+    hub: DistrictMessageHub = Depends(get_message_hub)
+):
+    """
+    Stores many ``MessageZoneChat`` messages at once, sent as a JSON array or
+    as NDJSON. Orders for every district are reserved in a single query and
+    the messages are written in chunks of ``BULK_INSERT_CHUNK_SIZE``. The
+    response has one result per input item, in input order.
+    """
     try:
-        db = return_db_instance()
-        cursor = db.aql.execute(
-            """
-            FOR msg IN messages
-                FILTER msg.district == @district
-                SORT msg.order DESC
-                LIMIT 6
-                RETURN msg
-            """,
-            bind_vars={"district": district}
+        items = await read_bulk_items(request)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Cuerpo inválido: {str(e)}")
+    if len(items) > BULK_MAX_MESSAGES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Se permiten como máximo {BULK_MAX_MESSAGES} mensajes por solicitud"
         )
-        
-        messages = [doc for doc in cursor][::-1]
-        
-        return {"data": messages}
+
+    results: list = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            message = MessageZoneChat.model_validate(item)
+        except ValidationError as e:
+            errors = [f"{' -> '.join(str(loc) for loc in error['loc'])}: {error['msg']}" for error in e.errors()]
+            results[index] = {"index": index, "status": "error", "errors": errors}
+            continue
+        message_data = message.dict()
+        message_data["created_at"] = message.created_at.isoformat()
+        message_data["updated_at"] = message.updated_at.isoformat() if message.updated_at else None
+        valid.append((index, message_data))
+
+    if valid:
+        counts: dict[str, int] = {}
+        for _, message_data in valid:
+            counts[message_data["district"]] = counts.get(message_data["district"], 0) + 1
+        try:
+            next_order = await messages.reserve_orders(counts)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error al reservar el orden de los mensajes: {str(e)}")
+        for _, message_data in valid:
+            message_data["order"] = next_order[message_data["district"]]
+            next_order[message_data["district"]] += 1
+
+        for start in range(0, len(valid), BULK_INSERT_CHUNK_SIZE):
+            chunk = valid[start:start + BULK_INSERT_CHUNK_SIZE]
+            try:
+                inserted = await messages.insert_many([message_data for _, message_data in chunk])
+            except Exception as e:
+                inserted = [e] * len(chunk)
+            for (index, message_data), outcome in zip(chunk, inserted):
+                if isinstance(outcome, Exception):
+                    results[index] = {"index": index, "status": "error", "errors": [str(outcome)]}
+                    continue
+                hub.publish(outcome.get("new", message_data))
+                results[index] = {"index": index, "status": "created", "uuid": message_data["uuid"], "order": message_data["order"]}
+
+    created = sum(1 for result in results if result["status"] == "created")
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+@router.get("/messages/{district}", status_code=status.HTTP_200_OK)
+async def get_last_six_messages(
+    district: str,
+    token_data: TokenClaims = Depends(get_current_user),
+    messages: MessageRepository = Depends(get_message_repository),
+    hub: DistrictMessageHub = Depends(get_message_hub)
+):
+    recent = hub.recent(district, 6)
+    if recent is not None:
+        return {"data": recent}
+
+    try:
+        latest = await messages.latest(district, limit=hub.buffer_size)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener los mensajes: {str(e)}")
+
+    hub.prime(district, latest)
+    return {"data": latest[-6:]}
+
+@router.get("/messages/{district}/history", status_code=status.HTTP_200_OK)
+async def get_message_history(
+    district: str,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: int = Query(20, ge=1),
+    token_data: TokenClaims = Depends(get_current_user),
+    messages: MessageRepository = Depends(get_message_repository)
+):
+    """
+    Pages through the history of a district, oldest first. Pass
+    ``cursor.before`` to load older messages and ``cursor.after`` to load newer
+    ones; ``has_more`` tells whether another page exists in that direction.
+    """
+    if before is not None and after is not None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Usa solo uno de 'before' o 'after'")
+    limit = min(limit, MESSAGE_PAGE_MAX)
+
+    try:
+        # One extra row tells whether there is another page
+        page = await messages.page(district, limit + 1, before=before, after=after)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al obtener los mensajes: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error al obtener los mensajes: {str(e)}")
+
+    has_more = len(page) > limit
+    if has_more:
+        page = page[:limit] if after is not None else page[1:]
+
+    return {
+        "data": page,
+        "has_more": has_more,
+        "cursor": {
+            "before": page[0]["order"] if page else before,
+            "after": page[-1]["order"] if page else after
+        }
+    }
+
+@router.post("/messages/batch", status_code=status.HTTP_200_OK)
+async def get_latest_messages_batch(
+    request: MessageBatchRequest,
+    token_data: TokenClaims = Depends(get_current_user),
+    messages: MessageRepository = Depends(get_message_repository),
+    hub: DistrictMessageHub = Depends(get_message_hub)
+):
+    """Returns the latest messages of several districts, reading only the ones not buffered in one query."""
+    districts = list(dict.fromkeys(request.districts))
+    data = {}
+    missing = []
+    for district in districts:
+        recent = hub.recent(district, request.limit)
+        if recent is None:
+            missing.append(district)
+        else:
+            data[district] = recent
+
+    if missing:
+        try:
+            fetched = await messages.latest_many(missing, max(request.limit, hub.buffer_size))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error al obtener los mensajes: {str(e)}")
+        for district, latest in fetched.items():
+            hub.prime(district, latest)
+            data[district] = latest[-request.limit:]
+
+    return {"data": {district: data.get(district, []) for district in districts}}
+
+@router.get("/messages/{district}/stream")
+async def stream_messages(
+    district: str,
+    request: Request,
+    province: Optional[str] = None,
+    token_data: TokenClaims = Depends(get_current_user),
+    hub: DistrictMessageHub = Depends(get_message_hub)
+):
+    """
+    Pushes new messages of ``district`` as Server-Sent Events. Alerts are sent
+    as ``alert`` events ahead of any queued ``message`` events, including
+    alerts of neighbouring districts of the same ``province`` (by default the
+    user's, when subscribing to their own district).
+
+    The stream is closed if the client falls too far behind; reconnecting
+    resumes it.
+    """
+    if province is None and token_data.district == district:
+        province = token_data.province
+
+    async def events():
+        subscriber = hub.subscribe(district, province)
+        try:
+            while True:
+                message = await subscriber.next(timeout=15)
+                if subscriber.closed:
+                    break
+                if message is None:
+                    # Comment frame, keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                data = {key: value for key, value in message.items() if not key.startswith("_")}
+                yield sse_event("alert" if message.get("is_alert") else "message", data)
+        finally:
+            hub.unsubscribe(subscriber)
+
+    return event_stream_response(request, events())
\ No newline at end of file
@@ -7,6 +7,9 @@ class InfoAgentArgs(BaseModel):
     district: str
     description: str
 
+class InfoAgentPrewarmArgs(BaseModel):
+    locations: List[InfoAgentArgs]
+
 class EmergencyContact(BaseModel):
     name: str = Field(..., description="Nombre del contacto de emergencia, como 'Policía', 'Bomberos', etc.")
     phone_number: str = Field(..., pattern=r"^\+?\d{9,15}$", description="Número de teléfono del contacto de emergencia.")
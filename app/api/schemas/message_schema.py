@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 import uuid
 
@@ -14,3 +14,7 @@ class MessageZoneChat(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = None
     is_alert: bool
+
+class MessageBatchRequest(BaseModel):
+    districts: List[str] = Field(..., min_length=1, max_length=100)
+    limit: int = Field(6, ge=1, le=50)
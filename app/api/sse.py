@@ -0,0 +1,39 @@
+import json
+from typing import Any, AsyncIterator
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    # Disable response buffering on nginx-style proxies
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(event: str, data: Any) -> str:
+    if not isinstance(data, str):
+        data = json.dumps(data, ensure_ascii=False, default=str)
+    lines = "".join(f"data: {line}\n" for line in data.split("\n"))
+    return f"event: {event}\n{lines}\n"
+
+
+async def _until_disconnected(request: Request, events: AsyncIterator[str]) -> AsyncIterator[str]:
+    try:
+        async for event in events:
+            if await request.is_disconnected():
+                break
+            yield event
+    finally:
+        # Closing the generator cancels whatever upstream work it is awaiting
+        await events.aclose()
+
+
+def event_stream_response(request: Request, events: AsyncIterator[str]) -> StreamingResponse:
+    """Streams ``events`` as Server-Sent Events and stops them as soon as the client goes away."""
+    return StreamingResponse(
+        _until_disconnected(request, events),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
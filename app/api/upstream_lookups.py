@@ -0,0 +1,83 @@
+import os
+from typing import Optional
+
+from fastapi import Request
+
+from app.api.cache import CacheBackend, ResponseCache, cache_key
+from app.api.http_clients import OutboundClientRegistry
+
+# 4xx answers mean "this DNI / IP does not exist", worth remembering for a
+# while. Anything else (5xx, timeouts) raises and is never cached.
+NEGATIVE_STATUS_CODES = {400, 404, 422}
+
+# RENIEC answers carry personal data from the national ID registry; only what
+# the DNI check reads is kept, in memory and in the shared cache
+RENIEC_FIELDS = ("numeroDocumento",)
+
+
+class UpstreamLookups:
+    """
+    Cached RENIEC DNI and ipgeolocation lookups.
+
+    Found and not-found answers are cached with separate TTLs, concurrent
+    identical lookups share one upstream call and, with a ``backend``,
+    entries survive restarts. Lookups return the upstream JSON, or None when
+    the upstream reported that the DNI / IP does not exist. RENIEC answers are
+    reduced to ``RENIEC_FIELDS`` before they are cached.
+    """
+
+    def __init__(self, http_clients: OutboundClientRegistry, backend: Optional[CacheBackend] = None):
+        self.http_clients = http_clients
+        self.reniec = ResponseCache(
+            "reniec",
+            max_entries=int(os.getenv("RENIEC_CACHE_SIZE", "10000")),
+            ttl=float(os.getenv("RENIEC_CACHE_TTL", "2592000")),
+            backend=backend,
+        )
+        self.reniec_negative_ttl = float(os.getenv("RENIEC_CACHE_NEGATIVE_TTL", "3600"))
+        self.geolocation = ResponseCache(
+            "ipgeolocation",
+            max_entries=int(os.getenv("IP_GEOLOCATION_CACHE_SIZE", "10000")),
+            ttl=float(os.getenv("IP_GEOLOCATION_CACHE_TTL", "604800")),
+            backend=backend,
+        )
+        self.geolocation_negative_ttl = float(os.getenv("IP_GEOLOCATION_CACHE_NEGATIVE_TTL", "3600"))
+
+    async def _fetch(self, upstream: str, url: str, fields: Optional[tuple] = None, **kwargs) -> dict:
+        response = await self.http_clients.get(upstream, url, **kwargs)
+        if response.status_code in NEGATIVE_STATUS_CODES:
+            return {"found": False}
+        response.raise_for_status()
+        data = response.json()
+        if fields is not None and isinstance(data, dict):
+            data = {field: data.get(field) for field in fields}
+        return {"found": True, "data": data}
+
+    async def reniec_dni(self, dni: str) -> Optional[dict]:
+        result = await self.reniec.get_or_load(
+            cache_key("reniec-dni", dni),
+            lambda: self._fetch(
+                "reniec",
+                "/v2/reniec/dni",
+                fields=RENIEC_FIELDS,
+                params={"numero": dni},
+                headers={"Authorization": f"Bearer {os.getenv('APIS_PE_TOKEN')}", "Accept": "application/json"}
+            ),
+            ttl=lambda result: self.reniec.ttl if result["found"] else self.reniec_negative_ttl,
+        )
+        return result["data"] if result["found"] else None
+
+    async def ip_geolocation(self, ip: str) -> Optional[dict]:
+        result = await self.geolocation.get_or_load(
+            cache_key("ipgeolocation", ip),
+            lambda: self._fetch("ipgeolocation", "/ipgeo", params={"apiKey": os.getenv("IP_GEOLOCATION_API_KEY"), "ip": ip}),
+            ttl=lambda result: self.geolocation.ttl if result["found"] else self.geolocation_negative_ttl,
+        )
+        return result["data"] if result["found"] else None
+
+    def stats(self) -> dict:
+        return {"reniec": self.reniec.stats(), "ipgeolocation": self.geolocation.stats()}
+
+
+def get_upstream_lookups(request: Request) -> UpstreamLookups:
+    return request.app.state.upstream_lookups
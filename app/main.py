@@ -4,10 +4,28 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.api.router import router
-from app.api.logger import setup_logger
+from app.api.logger import setup_logger, start_logging, stop_logging
 from app.api.error_utilities import ErrorResponse
+from app.api.db.connection import ArangoConnectionManager
+from app.api.db.schema import maintain_schema, verify_schema
+from app.api.db.cache_backend import ArangoCacheBackend
+from app.api.upstream_lookups import UpstreamLookups
+from app.api.features.security_plan import generate_security_plan, plan_cache
+from app.api.features.info_agent import generate_info_agent_results, info_cache, info_prewarmer
+from app.api.auth.passwords import PasswordHasher
+from app.api.http_clients import OutboundClientRegistry
+from app.api.realtime import DistrictMessageHub
+from app.api.features.chain_registry import chains
+from app.api.metrics import MetricsMiddleware
+from app.api.rate_limit import RateLimiter
+from app.api.db.rate_limit_backend import ArangoRateLimitBackend
+from app.api.db.repositories import JobRepository
+from app.api.jobs import JobManager
+from app.api.features.structured_output import StructuredOutputError
 
+import asyncio
 import os
+from functools import partial
 
 from dotenv import load_dotenv, find_dotenv
 
@@ -17,11 +35,66 @@ logger = setup_logger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    start_logging()
     logger.info(f"Initializing Application Startup")
+    app.state.arango = ArangoConnectionManager()
+    app.state.password_hasher = PasswordHasher()
+    app.state.http_clients = OutboundClientRegistry()
+    app.state.message_hub = DistrictMessageHub()
+    app.state.message_hub.alerts.start()
+    app.state.rate_limiter = RateLimiter(
+        backend=ArangoRateLimitBackend(app.state.arango) if os.getenv("RATE_LIMIT_BACKEND", "memory").lower() == "arango" else None
+    )
+    app.state.job_manager = JobManager(
+        # A cancelled or timed out job stops its generation instead of leaving it running unbounded
+        runners={
+            "security_plan": partial(generate_security_plan, cancel_abandoned=True),
+            "info_agent": partial(generate_info_agent_results, cancel_abandoned=True),
+        },
+        repository=JobRepository(app.state.arango)
+    )
+    app.state.job_manager.start()
+    info_prewarmer.start()
+    app.state.upstream_lookups = UpstreamLookups(
+        app.state.http_clients,
+        backend=ArangoCacheBackend(app.state.arango) if os.getenv("UPSTREAM_CACHE_PERSIST", "true").lower() == "true" else None
+    )
+    if os.getenv("SHARED_CACHE_BACKEND", "").lower() == "arango":
+        plan_cache.backend = ArangoCacheBackend(app.state.arango)
+        info_cache.backend = ArangoCacheBackend(app.state.arango, retention=info_cache.stale_ttl)
+    if os.getenv("CHAINS_WARM_UP", "true").lower() == "true":
+        chains.warm_up()
+    reload_interval = float(os.getenv("PROMPT_RELOAD_INTERVAL", "10"))
+    prompt_watcher = asyncio.create_task(chains.watch(reload_interval)) if reload_interval > 0 else None
+    health = await app.state.arango.executor.run(app.state.arango.health)
+    schema_ready = False
+    if health["status"] != "ok":
+        logger.warning(f"ArangoDB no disponible al iniciar: {health.get('error')}")
+    else:
+        schema_ready = await verify_schema(app.state.arango)
+    schema_watcher = None
+    if not schema_ready:
+        # Registration falls back to explicit duplicate checks until this succeeds
+        schema_watcher = asyncio.create_task(maintain_schema(
+            app.state.arango,
+            interval=float(os.getenv("SCHEMA_RETRY_INTERVAL", "5")),
+            max_interval=float(os.getenv("SCHEMA_RETRY_MAX_INTERVAL", "300")),
+        ))
     logger.info(f"Successfully Completed Application Startup")
     
     yield
     logger.info("Application shutdown")
+    if prompt_watcher:
+        prompt_watcher.cancel()
+    if schema_watcher:
+        schema_watcher.cancel()
+    await app.state.message_hub.alerts.close()
+    await app.state.job_manager.close()
+    await info_prewarmer.close()
+    await app.state.http_clients.aclose()
+    app.state.password_hasher.shutdown()
+    app.state.arango.close()
+    stop_logging()
 
 app = FastAPI(lifespan = lifespan)
 app.add_middleware(
@@ -31,6 +104,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -38,9 +112,9 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     for error in exc.errors():
         field = " -> ".join(str(loc) for loc in error['loc'])
         message = error['msg']
-        error_detail = f"Error in field '{field}': {message}"
-        errors.append(error_detail)
-        logger.error(error_detail)  # Log the error details
+        errors.append(f"Error in field '{field}': {message}")
+    # One line per request, not per field
+    logger.warning(f"Solicitud inválida en {request.url.path}: {len(errors)} errores")
 
     error_response = ErrorResponse(status=422, message=errors)
     return JSONResponse(
@@ -48,4 +122,13 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         content=error_response.dict()
     )
 
+@app.exception_handler(StructuredOutputError)
+async def structured_output_exception_handler(request: Request, exc: StructuredOutputError):
+    logger.error(f"Respuesta del modelo inválida en {request.url.path}: {exc}")
+    error_response = ErrorResponse(status=502, message=str(exc))
+    return JSONResponse(
+        status_code=502,
+        content=error_response.dict()
+    )
+
 app.include_router(router)
\ No newline at end of file
@@ -0,0 +1,46 @@
+"""
+Pre-warms the /info-agent cache of a running instance for a list of districts.
+
+Usage:
+    python -m app.prewarm locations.json --url http://localhost:8000 --api-key dev
+
+``locations.json`` holds a list of objects with ``department``, ``province``,
+``district`` and ``description``.
+"""
+import argparse
+import json
+import os
+import sys
+
+import httpx
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-warm the info-agent cache for a list of districts")
+    parser.add_argument("locations", help="JSON file with the list of locations")
+    parser.add_argument("--url", default=os.getenv("SECURITY_SHIELD_URL", "http://localhost:8000"))
+    parser.add_argument("--api-key", default=os.getenv("SECURITY_SHIELD_API_KEY", "dev"))
+    args = parser.parse_args(argv)
+
+    with open(args.locations, "r") as file:
+        locations = json.load(file)
+
+    response = httpx.post(
+        f"{args.url.rstrip('/')}/admin/info-agent/prewarm",
+        json={"locations": locations},
+        headers={"api-key": args.api_key},
+        timeout=30,
+    )
+    if response.is_error:
+        print(f"Error {response.status_code}: {response.text}", file=sys.stderr)
+        return 1
+
+    result = response.json()
+    print(f"Distritos programados: {result['scheduled']}")
+    if result.get("skipped"):
+        print(f"Distritos omitidos por cola llena: {result['skipped']}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
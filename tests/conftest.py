@@ -0,0 +1,7 @@
+import os
+
+# Feature modules build their LLM clients on import; the tests never reach
+# the real providers
+for name in ("GOOGLE_API_KEY", "OPENAI_API_KEY", "TAVILY_API_KEY", "JWT_SECRET_KEY"):
+    os.environ.setdefault(name, "test")
+os.environ.setdefault("ENV_TYPE", "dev")
@@ -0,0 +1,58 @@
+import hashlib
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.auth import auth as auth_module
+from app.api.auth.auth import VerifiedTokenCache, create_access_token, verify_token
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = VerifiedTokenCache(max_entries=100, ttl=300)
+    monkeypatch.setattr(auth_module, "token_cache", cache)
+    return cache
+
+
+def per_call(token: str, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        verify_token(token)
+    return (time.perf_counter() - started) / iterations
+
+
+def test_cache_hit_is_cheaper_than_decoding(cache, monkeypatch):
+    token = create_access_token({"user_id": "ana"})
+    iterations = 5_000
+
+    verify_token(token)
+    cached = per_call(token, iterations)
+    assert cache.stats()["hits"] == iterations
+
+    # A cache that evicts on every insert decodes the JWT on each call
+    monkeypatch.setattr(auth_module, "token_cache", VerifiedTokenCache(max_entries=0, ttl=300))
+    uncached = per_call(token, iterations)
+
+    assert cached < uncached, f"{cached * 1e6:.1f} µs cached vs {uncached * 1e6:.1f} µs uncached"
+    # A SHA-256 and a dict lookup; a generous bound so slow CI stays green
+    assert cached < 20e-6, f"{cached * 1e6:.1f} µs per cached call"
+
+
+def test_expired_entry_is_verified_again(cache, monkeypatch):
+    token = create_access_token({"user_id": "ana"})
+    claims = verify_token(token)
+
+    assert cache.get(hashlib.sha256(token.encode("utf-8")).digest()) is claims
+
+    monkeypatch.setattr(auth_module.time, "time", lambda: claims.exp + 1)
+    assert cache.get(hashlib.sha256(token.encode("utf-8")).digest()) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_invalid_token_is_not_cached(cache):
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            verify_token("no-es-un-jwt")
+
+    assert cache.stats() == {"entries": 0, "hits": 0, "misses": 2}
@@ -0,0 +1,65 @@
+import pytest
+
+from app.api.features import chatbot
+from app.api.features.chain_registry import chains
+from app.api.features.chat_context import ChatContextWindow, TokenCounter
+from app.api.schemas.schemas import ChatMessage, Message
+
+
+def conversation(count, words=30):
+    return [
+        Message(role="human" if index % 2 == 0 else "ai", type="text", payload={"text": f"mensaje número {index} " * words})
+        for index in range(count)
+    ]
+
+
+def render_for(query):
+    prompt = chains.get("chatbot").first
+    return lambda history: prompt.format(chat_history=history, user_name="Ana", user_query=query)
+
+
+@pytest.mark.parametrize("strategy", ["trim", "summarize"])
+def test_rendered_prompt_stays_within_budget(strategy):
+    window = ChatContextWindow(max_tokens=1200, strategy=strategy, summary_tokens=150, counter=TokenCounter())
+    messages = conversation(40)
+    render = render_for(messages[-1].payload.text)
+
+    history = window.build(messages, render)
+
+    assert history
+    assert history[-1].text == messages[-1].payload.text
+    assert window.prompt_tokens_last == window.counter.count(render(history))
+    assert window.prompt_tokens_last <= 1200
+
+
+def test_metric_matches_the_prompt_the_chain_sends():
+    window = ChatContextWindow(max_tokens=100_000, counter=TokenCounter())
+    messages = conversation(3)
+    query = messages[-1].payload.text
+
+    history = window.build(messages, render_for(query))
+    sent = chains.get("chatbot").first.invoke({"chat_history": history, "user_name": "Ana", "user_query": query}).to_string()
+
+    assert window.prompt_tokens_last == window.counter.count(sent)
+
+
+def test_template_larger_than_budget_keeps_no_history():
+    window = ChatContextWindow(max_tokens=50, counter=TokenCounter())
+    messages = conversation(3)
+
+    assert window.build(messages, render_for(messages[-1].payload.text)) == []
+
+
+def test_summary_is_clamped_below_the_budget():
+    window = ChatContextWindow(max_tokens=300, strategy="summarize", summary_tokens=400, counter=TokenCounter())
+    assert window.summary_tokens == 150
+
+
+def test_chatbot_context_counts_the_full_prompt():
+    messages = conversation(5)
+    before = chatbot.chat_context.requests
+    history = chatbot.build_chat_context(messages, "Ana", messages[-1].payload.text)
+
+    assert isinstance(history[0], ChatMessage)
+    assert chatbot.chat_context.requests == before + 1
+    assert chatbot.chat_context.prompt_tokens_last > sum(chatbot.chat_context.counter.count(m.text) for m in history)
@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from langchain_core.language_models.fake import FakeListLLM
+
+from app.api.features import chatbot
+from app.api.features.chain_registry import chains
+from app.api.features.concurrency import ProviderLimiter
+
+LATENCY = 0.2
+
+
+class SlowFakeLLM(FakeListLLM):
+    """Answers after ``latency`` seconds without blocking the event loop, like a real provider call."""
+
+    latency: float = LATENCY
+
+    async def _acall(self, prompt, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self.responses[0]
+
+
+@pytest.fixture
+def fake_chatbot():
+    chains.get("chatbot")
+    original = chains._chains["chatbot"]
+    chains._chains["chatbot"] = chatbot.build_prompt() | SlowFakeLLM(responses=["Hola"])
+    yield
+    chains._chains["chatbot"] = original
+
+
+def test_concurrent_chat_requests_overlap(fake_chatbot):
+    requests = 8
+
+    async def main():
+        started = time.perf_counter()
+        answers = await asyncio.gather(*(chatbot.chatbot_executor("Ana", "¿Qué hago?", []) for _ in range(requests)))
+        return answers, time.perf_counter() - started
+
+    answers, elapsed = asyncio.run(main())
+
+    assert answers == ["Hola"] * requests
+    # Blocking calls would take requests * LATENCY
+    assert elapsed < 2 * LATENCY
+
+
+def test_limiter_queues_callers_over_the_limit():
+    limiter = ProviderLimiter("test", max_concurrency=2, max_wait=5)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        async with limiter.slot():
+            peak = max(peak, limiter.active)
+            await asyncio.sleep(0.05)
+
+    async def main():
+        started = time.perf_counter()
+        await asyncio.gather(*(call() for _ in range(6)))
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(main())
+
+    assert peak == 2
+    assert elapsed >= 3 * 0.05
+    assert limiter.stats()["completed"] == 6
+    assert limiter.stats()["rejected"] == 0
+
+
+def test_limiter_rejects_when_wait_runs_out():
+    limiter = ProviderLimiter("test", max_concurrency=1, max_wait=0.05)
+
+    async def hold():
+        async with limiter.slot():
+            await asyncio.sleep(0.2)
+
+    async def main():
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as error:
+            async with limiter.slot():
+                pass
+        await holder
+        return error.value
+
+    error = asyncio.run(main())
+
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "1"
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_limiter_without_wait_rejects_immediately():
+    limiter = ProviderLimiter("test", max_concurrency=1, max_wait=0)
+
+    async def main():
+        async with limiter.slot():
+            started = time.perf_counter()
+            with pytest.raises(HTTPException):
+                async with limiter.slot():
+                    pass
+            return time.perf_counter() - started
+
+    assert asyncio.run(main()) < 0.01
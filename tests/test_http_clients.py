@@ -0,0 +1,111 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.api import http_clients as http_clients_module
+from app.api.http_clients import OutboundClientRegistry, UpstreamConfig
+
+
+class Upstream:
+    """Local fake answering with a scripted sequence of statuses or exceptions."""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        step = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        if isinstance(step, Exception):
+            raise step
+        return httpx.Response(step, json={"ok": step == 200}, request=request)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Records backoff delays instead of waiting, always taking the top of the jitter range."""
+    delays = []
+
+    async def sleep(seconds):
+        delays.append(seconds)
+
+    monkeypatch.setattr(http_clients_module.asyncio, "sleep", sleep)
+    monkeypatch.setattr(http_clients_module.random, "uniform", lambda low, high: high)
+    return delays
+
+
+def registry(upstream, retries=2):
+    config = UpstreamConfig(base_url="https://fake.test", retries=retries, backoff=0.2, max_backoff=0.5)
+    return OutboundClientRegistry({"fake": config}, transport=httpx.MockTransport(upstream))
+
+
+def run(clients, method="GET"):
+    async def main():
+        try:
+            return await clients.request("fake", method, "/resource")
+        finally:
+            await clients.aclose()
+
+    return asyncio.run(main())
+
+
+def test_retries_5xx_then_succeeds(sleeps):
+    upstream = Upstream(503, 502, 200)
+    clients = registry(upstream)
+
+    response = run(clients)
+    stats = clients.stats()["fake"]
+
+    assert response.status_code == 200
+    assert upstream.calls == 3
+    assert stats["requests"] == 3
+    assert stats["retries"] == 2
+    assert stats["status_errors"] == 2
+    assert stats["errors"] == 0
+    # Exponential backoff capped at max_backoff
+    assert sleeps == [0.4, 0.5]
+
+
+def test_connect_errors_are_retried_then_raised(sleeps):
+    upstream = Upstream(httpx.ConnectError("refused"))
+    clients = registry(upstream, retries=2)
+
+    with pytest.raises(httpx.ConnectError):
+        run(clients)
+    stats = clients.stats()["fake"]
+
+    assert upstream.calls == 3
+    assert stats["errors"] == 3
+    assert stats["retries"] == 2
+
+
+def test_timeouts_are_retried(sleeps):
+    upstream = Upstream(httpx.ReadTimeout("slow"), 200)
+    clients = registry(upstream)
+
+    assert run(clients).status_code == 200
+    assert clients.stats()["fake"]["errors"] == 1
+    assert clients.stats()["fake"]["retries"] == 1
+
+
+def test_non_idempotent_requests_are_not_retried(sleeps):
+    upstream = Upstream(503, 200)
+    clients = registry(upstream)
+
+    response = run(clients, method="POST")
+
+    assert response.status_code == 503
+    assert upstream.calls == 1
+    assert clients.stats()["fake"]["retries"] == 0
+    assert sleeps == []
+
+
+def test_client_errors_are_returned_without_retry(sleeps):
+    upstream = Upstream(404)
+    clients = registry(upstream)
+
+    assert run(clients).status_code == 404
+    stats = clients.stats()["fake"]
+    assert (stats["requests"], stats["retries"], stats["status_errors"]) == (1, 0, 1)
+    assert stats["latency_max_ms"] >= stats["latency_avg_ms"] > 0
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from app.api.features import info_agent
+from app.api.schemas.info_agent_schemas import InfoAgentArgs
+
+
+@pytest.fixture
+def slow_agent(monkeypatch):
+    async def run(data):
+        await asyncio.sleep(0.2)
+        return {"district": data.district}
+
+    monkeypatch.setattr(info_agent, "run_info_agent", run)
+    monkeypatch.setattr(info_agent, "info_cache", info_agent.ResponseCache("test", ttl=60))
+
+
+def location(district):
+    return InfoAgentArgs(department="Lima", province="Lima", district=district, description="")
+
+
+def test_closing_the_prewarmer_does_not_cancel_a_shared_user_request(slow_agent):
+    async def main():
+        prewarmer = info_agent.InfoAgentPrewarmer(concurrency=1)
+        prewarmer.start()
+        prewarmer.schedule([location("Miraflores")])
+        await asyncio.sleep(0.05)
+        user = asyncio.ensure_future(info_agent.generate_info_agent_results(location("Miraflores")))
+        await asyncio.sleep(0.05)
+        await prewarmer.close()
+        return await user
+
+    assert asyncio.run(main()) == {"district": "Miraflores"}
+
+
+def test_prewarm_queue_is_bounded(slow_agent):
+    async def main():
+        prewarmer = info_agent.InfoAgentPrewarmer(concurrency=1, queue_limit=2)
+        scheduled = prewarmer.schedule([location(f"d{index}") for index in range(5)])
+        return scheduled, prewarmer.stats()
+
+    scheduled, stats = asyncio.run(main())
+
+    assert scheduled == 2
+    assert stats["skipped"] == 3
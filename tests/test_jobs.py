@@ -0,0 +1,95 @@
+import asyncio
+
+from pydantic import BaseModel
+
+from app.api.cache import ResponseCache
+from app.api.jobs import JobManager
+
+
+class Payload(BaseModel):
+    n: int
+
+
+class Generations:
+    """Stands in for a model call behind the response cache, tracking how many run at once."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.cache = ResponseCache("test")
+        self.active = 0
+        self.peak = 0
+        self.completed = 0
+
+    async def load(self, n):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.latency)
+            self.completed += 1
+            return n
+        finally:
+            self.active -= 1
+
+    async def run(self, payload: Payload):
+        return await self.cache.get_or_load(f"k{payload.n}", lambda: self.load(payload.n), cancel_abandoned=True)
+
+
+def test_timed_out_jobs_stop_their_generation():
+    generations = Generations(latency=1.0)
+
+    async def main():
+        jobs = JobManager({"plan": generations.run}, workers=2, timeout=0.2)
+        jobs.start()
+        for n in range(4):
+            await jobs.submit("plan", Payload(n=n), "ana")
+        await asyncio.sleep(1.5)
+        await jobs.close()
+        return jobs.stats()
+
+    stats = asyncio.run(main())
+
+    assert stats["completed"]["timed_out"] == 4
+    assert generations.peak == 2
+    assert generations.completed == 0
+
+
+def test_cancel_returns_cancelled_once_the_generation_stopped():
+    generations = Generations(latency=5)
+
+    async def main():
+        jobs = JobManager({"plan": generations.run}, workers=1, timeout=10)
+        jobs.start()
+        job = await jobs.submit("plan", Payload(n=1), "ana")
+        await asyncio.sleep(0.05)
+        cancelled = await jobs.cancel(job["job_id"], "ana")
+        active = generations.active
+        await jobs.close()
+        return cancelled, active
+
+    cancelled, active = asyncio.run(main())
+
+    assert cancelled["status"] == "cancelled"
+    assert active == 0
+
+
+def test_shared_job_keeps_running_until_every_submitter_cancels():
+    generations = Generations(latency=0.2)
+
+    async def main():
+        jobs = JobManager({"plan": generations.run}, workers=1, timeout=10)
+        jobs.start()
+        first = await jobs.submit("plan", Payload(n=1), "ana")
+        second = await jobs.submit("plan", Payload(n=1), "luis")
+        await asyncio.sleep(0.05)
+        left = await jobs.cancel(first["job_id"], "ana")
+        await asyncio.sleep(0.3)
+        result = await jobs.get(second["job_id"], "luis")
+        await jobs.close()
+        return first, second, left, result
+
+    first, second, left, result = asyncio.run(main())
+
+    assert first["job_id"] == second["job_id"]
+    assert left["status"] == "cancelled"
+    assert result["status"] == "succeeded"
+    assert result["result"] == 1
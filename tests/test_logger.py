@@ -0,0 +1,89 @@
+import io
+import json
+import logging
+import queue
+import time
+from logging.handlers import QueueListener
+
+import pytest
+
+from app.api.logger import JsonFormatter, RateLimitFilter, TruncatingQueueHandler
+
+
+@pytest.fixture
+def pipeline():
+    """The same handler, filter and listener chain setup_logger wires, writing to a buffer."""
+    output = io.StringIO()
+    stream_handler = logging.StreamHandler(output)
+    stream_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(maxsize=100_000)
+    handler = TruncatingQueueHandler(log_queue, max_length=50)
+    handler.addFilter(RateLimitFilter(rate=1_000_000, burst=1_000_000, sample_rate=1.0))
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+
+    logger = logging.getLogger("tests.logger")
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    listener.start()
+    yield logger, handler, listener, output
+    logger.handlers = []
+
+
+def lines(output: io.StringIO) -> list[dict]:
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_info_overhead_with_queue_handler(pipeline):
+    logger, handler, listener, output = pipeline
+    iterations = 10_000
+
+    started = time.perf_counter()
+    for index in range(iterations):
+        logger.info("Mensaje %d para %s", index, "Miraflores")
+    per_call = (time.perf_counter() - started) / iterations
+    listener.stop()
+
+    # Filter, merge and enqueue only; a generous bound so slow CI stays green
+    assert per_call < 50e-6, f"{per_call * 1e6:.1f} µs per call"
+    records = lines(output)
+    assert handler.dropped == 0
+    assert len(records) == iterations
+    assert records[-1]["message"] == f"Mensaje {iterations - 1} para Miraflores"
+    assert records[-1]["severity"] == "INFO"
+    assert records[-1]["logger"] == "tests.logger"
+
+
+def test_records_reach_the_listener_truncated_with_exceptions(pipeline):
+    logger, handler, listener, output = pipeline
+
+    logger.info("x" * 80)
+    try:
+        raise ValueError("fallo")
+    except ValueError:
+        logger.exception("Error al procesar")
+    listener.stop()
+
+    long_record, error_record = lines(output)
+    assert long_record["message"] == "x" * 50 + "... [30 caracteres truncados]"
+    assert error_record["severity"] == "ERROR"
+    assert "ValueError: fallo" in error_record["exception"]
+
+
+def test_rate_limit_reports_suppressed_records(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("app.api.logger.time.monotonic", lambda: now[0])
+    limiter = RateLimitFilter(rate=1, burst=2, sample_rate=1.0)
+
+    def record(level=logging.INFO):
+        return logging.LogRecord("tests.logger", level, __file__, 1, "mensaje", None, None)
+
+    assert [limiter.filter(record()) for _ in range(4)] == [True, True, False, False]
+    assert limiter.filter(record(logging.WARNING))
+
+    now[0] += 1
+    passed = record()
+    assert limiter.filter(passed)
+    assert passed.suppressed == 2
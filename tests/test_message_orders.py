@@ -0,0 +1,142 @@
+"""
+Runs against a real ArangoDB, e.g. the one in docker-compose.yml:
+
+    ARANGODB_TEST_DATABASE=_system ARANGODB_USERNAME=root ARANGODB_PASSWORD=password pytest tests/test_message_orders.py
+
+Skipped unless ARANGODB_TEST_DATABASE is set. Collections are created if
+missing and only documents of a throwaway district are written.
+"""
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.api.db.connection import ArangoConnectionManager
+from app.api.db.repositories import MessageRepository
+from app.api.db.schema import ensure_schema
+from app.api.router import BULK_INSERT_CHUNK_SIZE
+
+pytestmark = pytest.mark.skipif(
+    not os.getenv("ARANGODB_TEST_DATABASE"), reason="ARANGODB_TEST_DATABASE is not set"
+)
+
+POSTS = 50
+
+
+@pytest.fixture
+def manager():
+    manager = ArangoConnectionManager(database=os.environ["ARANGODB_TEST_DATABASE"], pool_size=POSTS)
+    ensure_schema(manager.db)
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def district(manager):
+    district = f"test-{uuid.uuid4()}"
+    yield district
+    for collection in ("messages", "message_counters"):
+        manager.db.aql.execute(
+            f"FOR doc IN {collection} FILTER doc.district == @district REMOVE doc IN {collection}",
+            bind_vars={"district": district},
+        )
+
+
+def message(district, index):
+    return {
+        "uuid": str(uuid.uuid4()),
+        "department": "Lima",
+        "province": "Lima",
+        "district": district,
+        "fullname": "Prueba",
+        "message_content": f"mensaje {index}",
+        "created_at": datetime.utcnow().isoformat(),
+        "updated_at": None,
+        "is_alert": False,
+    }
+
+
+def test_parallel_posts_get_unique_consecutive_orders(manager, district):
+    messages = MessageRepository(manager)
+
+    async def main():
+        return await asyncio.gather(*(messages.insert_next(message(district, index)) for index in range(POSTS)))
+
+    saved = asyncio.run(main())
+
+    assert sorted(doc["order"] for doc in saved) == list(range(1, POSTS + 1))
+
+
+def test_bulk_reservations_do_not_overlap_single_posts(manager, district):
+    messages = MessageRepository(manager)
+
+    async def main():
+        return await asyncio.gather(
+            *(messages.insert_next(message(district, index)) for index in range(POSTS)),
+            *(messages.reserve_orders({district: 5}) for _ in range(10)),
+        )
+
+    results = asyncio.run(main())
+    orders = [doc["order"] for doc in results[:POSTS]]
+    for reservation in results[POSTS:]:
+        orders.extend(range(reservation[district], reservation[district] + 5))
+
+    assert sorted(orders) == list(range(1, POSTS + 50 + 1))
+
+
+def test_concurrent_reservations_are_contiguous_and_disjoint(manager, district):
+    messages = MessageRepository(manager)
+    counts = [1 + index % 7 for index in range(POSTS)]
+
+    async def main():
+        return await asyncio.gather(*(messages.reserve_orders({district: count}) for count in counts))
+
+    reservations = asyncio.run(main())
+    ranges = sorted((reservation[district], count) for reservation, count in zip(reservations, counts))
+
+    expected = 1
+    for first, count in ranges:
+        assert first == expected
+        expected += count
+    assert expected == sum(counts) + 1
+
+
+def test_bulk_insert_outpaces_one_by_one(manager, district):
+    messages = MessageRepository(manager)
+    total = 2 * BULK_INSERT_CHUNK_SIZE
+
+    async def one_by_one():
+        started = time.perf_counter()
+        for index in range(total):
+            await messages.insert_next(message(district, index))
+        return total / (time.perf_counter() - started)
+
+    async def bulk():
+        # What POST /messages/bulk does: one reservation, then chunked inserts
+        started = time.perf_counter()
+        first = (await messages.reserve_orders({district: total}))[district]
+        batch = [{**message(district, index), "order": first + index} for index in range(total)]
+        for start in range(0, total, BULK_INSERT_CHUNK_SIZE):
+            results = await messages.insert_many(batch[start:start + BULK_INSERT_CHUNK_SIZE])
+            assert not any(isinstance(result, Exception) for result in results)
+        return total / (time.perf_counter() - started)
+
+    single_rate = asyncio.run(one_by_one())
+    bulk_rate = asyncio.run(bulk())
+
+    assert bulk_rate > 5 * single_rate, f"{bulk_rate:.0f} msgs/s bulk vs {single_rate:.0f} msgs/s one by one"
+    orders = [doc["order"] for doc in manager.db.aql.execute(
+        "FOR msg IN messages FILTER msg.district == @district RETURN msg.order",
+        bind_vars={"district": district},
+    )]
+    assert sorted(orders) == list(range(1, 2 * total + 1))
+
+
+def test_counter_starts_after_existing_messages(manager, district):
+    manager.db.collection("messages").insert({**message(district, 0), "order": 7})
+    saved = asyncio.run(MessageRepository(manager).insert_next(message(district, 1)))
+
+    assert saved["order"] == 8
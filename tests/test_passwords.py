@@ -0,0 +1,69 @@
+import asyncio
+import math
+import os
+import time
+
+from app.api.auth.passwords import PasswordHasher
+
+ROUNDS = 10
+LOGINS = 8
+
+
+def test_concurrent_logins_run_on_the_pool_without_blocking_the_loop():
+    # Threads only help with a core per worker; bcrypt releases the GIL
+    workers = max(1, min(4, os.cpu_count() or 1))
+    hasher = PasswordHasher(rounds=ROUNDS, workers=workers, queue_limit=LOGINS)
+    hashed = hasher.context.hash("secreto")
+    started = time.perf_counter()
+    hasher.context.verify("secreto", hashed)
+    cost = time.perf_counter() - started
+
+    async def main():
+        longest_gap = 0.0
+        running = True
+
+        async def heartbeat():
+            nonlocal longest_gap
+            last = time.perf_counter()
+            while running:
+                await asyncio.sleep(0.005)
+                now = time.perf_counter()
+                longest_gap = max(longest_gap, now - last)
+                last = now
+
+        beating = asyncio.ensure_future(heartbeat())
+        started = time.perf_counter()
+        results = await asyncio.gather(*(hasher.verify_and_update("secreto", hashed) for _ in range(LOGINS)))
+        elapsed = time.perf_counter() - started
+        running = False
+        await beating
+        return results, elapsed, longest_gap
+
+    try:
+        results, elapsed, longest_gap = asyncio.run(main())
+    finally:
+        hasher.shutdown()
+
+    assert results == [(True, None)] * LOGINS
+    assert elapsed < math.ceil(LOGINS / workers) * cost * 1.5 + 0.1
+    # A hash on the loop itself would stall the heartbeat for a whole bcrypt cost
+    assert longest_gap < max(0.05, cost / 2)
+    assert hasher.stats()["pending"] == 0
+    assert hasher.stats()["completed"] == LOGINS
+
+
+def test_queue_limit_rejects_overflow():
+    hasher = PasswordHasher(rounds=ROUNDS, workers=1, queue_limit=1)
+
+    async def main():
+        return await asyncio.gather(*(hasher.hash("secreto") for _ in range(4)), return_exceptions=True)
+
+    try:
+        results = asyncio.run(main())
+    finally:
+        hasher.shutdown()
+
+    rejected = [result for result in results if isinstance(result, Exception)]
+    assert len(rejected) == 2
+    assert all(error.status_code == 503 for error in rejected)
+    assert hasher.stats()["rejected"] == 2
@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import rate_limit as rate_limit_module
+from app.api.auth.auth import TokenClaims, get_current_user
+from app.api.rate_limit import InMemoryRateLimitBackend, RateLimit, RateLimiter, rate_limit
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit_module.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def test_parse():
+    limit = RateLimit.parse("20/minute;burst=5")
+    assert limit.rate == pytest.approx(20 / 60)
+    assert limit.burst == 5
+    assert RateLimit.parse("3/second").burst == 3
+    assert RateLimit.parse("off") is None
+    assert RateLimit.parse("0") is None
+
+
+def test_bucket_allows_burst_then_refills(clock):
+    backend = InMemoryRateLimitBackend()
+    limit = RateLimit.parse("60/minute;burst=2")
+
+    assert backend.take("k", limit) == 0
+    assert backend.take("k", limit) == 0
+    assert backend.take("k", limit) == pytest.approx(1.0)
+
+    clock.now += 1
+    assert backend.take("k", limit) == 0
+
+
+def test_user_over_limit_does_not_spend_district_tokens(clock):
+    limiter = RateLimiter(limits={"chat": {"user": "1/minute", "district": "2/minute", "global": "off"}})
+
+    async def main():
+        return [
+            await limiter.check("chat", "ana", "Miraflores"),
+            await limiter.check("chat", "ana", "Miraflores"),
+            await limiter.check("chat", "ana", "Miraflores"),
+            await limiter.check("chat", "luis", "Miraflores"),
+            await limiter.check("chat", "rosa", "Miraflores"),
+        ]
+
+    results = asyncio.run(main())
+
+    assert [scope for scope, _ in results] == [None, "user", "user", None, "district"]
+    assert results[1][1] == pytest.approx(60)
+    assert limiter.stats()["rejected"] == 3
+
+
+def test_dependency_rejects_with_429_and_retry_after(clock):
+    app = FastAPI()
+    app.state.rate_limiter = RateLimiter(limits={"chat": {"user": "1/minute"}})
+    app.dependency_overrides[get_current_user] = lambda: TokenClaims({"user_id": "ana", "district": "Miraflores"})
+
+    @app.post("/chat", dependencies=[Depends(rate_limit("chat"))])
+    async def chat():
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert client.post("/chat").status_code == 200
+    response = client.post("/chat")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "60"
+
+
+def test_check_overhead_is_in_the_microsecond_range():
+    limiter = RateLimiter(limits={"chat": {"user": "1000000/second", "district": "1000000/second", "global": "1000000/second"}})
+    iterations = 20_000
+
+    async def main():
+        users = [f"user-{index}" for index in range(1000)]
+        started = time.perf_counter()
+        for index in range(iterations):
+            await limiter.check("chat", users[index % 1000], "Miraflores")
+        return time.perf_counter() - started
+
+    per_check = asyncio.run(main()) / iterations
+
+    # Three bucket updates per check; a generous bound so slow CI stays green
+    assert per_check < 50e-6, f"{per_check * 1e6:.1f} µs per check"
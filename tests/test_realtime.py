@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+from app.api.realtime import DistrictMessageHub
+
+SUBSCRIBERS = 10_000
+
+
+def message(district, province="Lima", is_alert=False, text="hola"):
+    return {"district": district, "province": province, "is_alert": is_alert, "message": text}
+
+
+def test_alert_reaches_10k_local_subscribers_and_neighbours():
+    async def main():
+        hub = DistrictMessageHub(max_pending=10)
+        hub.alerts.batch_size = 500
+        hub.alerts.start()
+
+        district = [hub.subscribe("Miraflores", "Lima") for _ in range(SUBSCRIBERS)]
+        neighbours = [hub.subscribe("Barranco", "Lima") for _ in range(100)]
+        elsewhere = [hub.subscribe("Cayma", "Arequipa") for _ in range(100)]
+
+        async def client(subscriber):
+            return await subscriber.next(timeout=10)
+
+        clients = [asyncio.ensure_future(client(s)) for s in district + neighbours]
+        await asyncio.sleep(0)
+
+        # Measures how long the event loop is held up while the fan-out runs
+        longest_gap = 0.0
+        running = True
+
+        async def ticker():
+            nonlocal longest_gap
+            last = time.perf_counter()
+            while running:
+                await asyncio.sleep(0)
+                now = time.perf_counter()
+                longest_gap = max(longest_gap, now - last)
+                last = now
+
+        ticking = asyncio.ensure_future(ticker())
+        hub.publish(message("Miraflores", is_alert=True, text="Robo en curso"))
+        received = await asyncio.gather(*clients)
+        running = False
+        await ticking
+        await hub.alerts.close()
+        return hub, received, elsewhere, longest_gap
+
+    hub, received, elsewhere, longest_gap = asyncio.run(main())
+    stats = hub.alerts.stats()
+
+    assert all(m is not None and m["message"] == "Robo en curso" for m in received)
+    assert all(s.queue.empty() for s in elsewhere)
+    assert stats["jobs"] == 2
+    assert stats["deliveries"] == SUBSCRIBERS + 100
+    assert stats["delivery_latency"]["count"] == SUBSCRIBERS + 100
+    assert stats["fanout_latency"]["count"] == 2
+    # Batches yield to the loop, so no single tick covers the whole fan-out
+    assert longest_gap < stats["fanout_latency"]["max_ms"] / 1000
+
+
+def test_alerts_jump_ahead_of_queued_messages():
+    async def main():
+        hub = DistrictMessageHub(max_pending=10)
+        subscriber = hub.subscribe("Miraflores", "Lima")
+        hub.publish(message("Miraflores", text="primero"))
+        hub.publish(message("Miraflores", text="segundo"))
+        hub.publish(message("Miraflores", is_alert=True, text="alerta"))
+        return [(await subscriber.next(timeout=1))["message"] for _ in range(3)]
+
+    assert asyncio.run(main()) == ["alerta", "primero", "segundo"]
+
+
+def test_slow_consumer_drops_messages_then_is_evicted_on_alerts():
+    async def main():
+        hub = DistrictMessageHub(max_pending=2)
+        slow = hub.subscribe("Miraflores", "Lima")
+        for index in range(5):
+            hub.publish(message("Miraflores", text=f"m{index}"))
+        dropped = slow.dropped
+        # alert_limit defaults to twice max_pending
+        for index in range(3):
+            hub.publish(message("Miraflores", is_alert=True, text=f"a{index}"))
+        return hub, slow, dropped
+
+    hub, slow, dropped = asyncio.run(main())
+
+    assert dropped == 3
+    assert slow.closed
+    assert hub.alerts.stats()["evicted"] == 1
+    assert not hub.subscribers("Miraflores")
+
+
+def test_buffer_keeps_messages_ordered_when_writes_finish_out_of_order():
+    hub = DistrictMessageHub(buffer_size=3, buffer_ttl=60)
+    hub.prime("Miraflores", [{"district": "Miraflores", "order": 4}])
+    for order in (6, 5, 8, 7, 3):
+        hub.publish({"district": "Miraflores", "order": order, "is_alert": False})
+
+    assert [m["order"] for m in hub.recent("Miraflores", 3)] == [6, 7, 8]
+
+    hub.publish({"district": "Miraflores", "order": 9, "is_alert": False})
+    assert [m["order"] for m in hub.recent("Miraflores", 3)] == [7, 8, 9]
@@ -0,0 +1,92 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from langchain_core.language_models.fake import FakeListLLM
+
+from app.api.auth.auth import create_access_token
+from app.api.db.connection import DatabaseExecutor
+from app.api.features import chatbot
+from app.api.features.chain_registry import chains
+from app.api.rate_limit import RateLimiter
+from app.api.realtime import DistrictMessageHub
+from app.api.router import router
+
+LLM_LATENCY = 0.3
+DB_LATENCY = 0.005
+
+
+class SlowFakeLLM(FakeListLLM):
+    latency: float = LLM_LATENCY
+
+    async def _acall(self, prompt, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self.responses[0]
+
+
+class FakeAQL:
+    """Blocks like python-arango does while the query runs."""
+
+    def execute(self, query, bind_vars=None):
+        time.sleep(DB_LATENCY)
+        return [{"district": bind_vars["district"], "order": order, "text": f"Mensaje {order}"} for order in range(bind_vars["limit"], 0, -1)]
+
+
+class FakeManager:
+    def __init__(self):
+        self.db = SimpleNamespace(aql=FakeAQL())
+        self.executor = DatabaseExecutor(max_workers=4)
+
+
+@pytest.fixture
+def app():
+    chains.get("chatbot")
+    original = chains._chains["chatbot"]
+    chains._chains["chatbot"] = chatbot.build_prompt() | SlowFakeLLM(responses=["Hola"])
+
+    app = FastAPI()
+    app.include_router(router)
+    # A zero TTL sends every read to the repository instead of the buffer
+    app.state.message_hub = DistrictMessageHub(buffer_ttl=0)
+    app.state.rate_limiter = RateLimiter(limits={})
+    app.state.arango = FakeManager()
+    yield app
+    app.state.arango.executor.shutdown()
+    chains._chains["chatbot"] = original
+
+
+def test_message_reads_stay_fast_while_chats_wait_on_the_model(app):
+    token = create_access_token({"user_id": "ana", "district": "Miraflores"})
+    headers = {"Authorization": f"Bearer {token}"}
+    chat = {
+        "user": {"id": "ana", "fullName": "Ana Pérez", "email": "ana@example.com"},
+        "type": "chat",
+        "messages": [{"role": "human", "type": "text", "payload": {"text": "¿Qué hago?"}}],
+    }
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+            chats = [asyncio.ensure_future(client.post("/chat", json=chat)) for _ in range(8)]
+            await asyncio.sleep(0.01)
+
+            latencies = []
+            while not all(task.done() for task in chats):
+                started = time.perf_counter()
+                response = await client.get("/messages/Miraflores")
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200
+                assert len(response.json()["data"]) == 6
+            return await asyncio.gather(*chats), sorted(latencies)
+
+    answers, latencies = asyncio.run(main())
+
+    assert [answer.status_code for answer in answers] == [200] * 8
+    assert all(answer.json()["data"][0]["payload"]["text"] == "Hola" for answer in answers)
+    assert len(latencies) >= 10
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    # A read that queued behind the model calls would take LLM_LATENCY
+    assert p99 < LLM_LATENCY / 3, f"p99 {p99 * 1000:.1f} ms over {len(latencies)} reads"
@@ -0,0 +1,150 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import JsonOutputParser
+from pydantic import ValidationError
+
+from app.api.features.structured_output import StructuredOutputError, StructuredOutputValidator, repair_json
+from app.api.schemas.info_agent_schemas import SecurityPlanDataCollection
+
+VALID = {
+    "department": "Lima",
+    "province": "Lima",
+    "district": "Miraflores",
+    "emergency_contacts": [
+        {"name": "Policía", "phone_number": "014758888", "description": "Emergencias policiales"},
+        {"name": "Bomberos", "phone_number": "012225555", "description": None},
+    ],
+    "alarm_activation_buttons": [
+        {"location": "Parque Kennedy", "activation_code": None, "response_time": 5, "active_status": True},
+    ],
+    "neighborhood_communication_channels": [
+        {"platform": "WhatsApp", "contact_list": ["Junta vecinal"], "description": None},
+    ],
+    "key_contacts": [
+        {"role": "Serenazgo", "name": "Serenazgo Miraflores", "phone_number": "013130000", "available_hours": "24 horas"},
+    ],
+    "help_centers": [
+        {
+            "center_name": "Comisaría de Miraflores",
+            "address": "Calle General Suárez 190",
+            "contact_number": "014454224",
+            "services_provided": ["denuncias"],
+            "opening_hours": None,
+        },
+    ],
+    "security_information": [
+        {"title": "Prevención de robos", "description": "Evita mostrar el celular en la vía pública.", "last_updated": None, "relevance": None},
+    ],
+}
+
+TEXT = json.dumps(VALID, ensure_ascii=False, indent=2)
+
+
+def with_item(field, index, **changes):
+    data = json.loads(TEXT)
+    data[field][index].update(changes)
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+
+# Model outputs seen in practice, all of which still carry a usable plan
+MALFORMED = {
+    "markdown_fence": f"```json\n{TEXT}\n```",
+    "prose_around": f"Aquí tienes la información solicitada:\n{TEXT}\nEspero que sea útil.",
+    "trailing_commas": TEXT.replace('"24 horas"', '"24 horas",').replace('"denuncias"]', '"denuncias",]'),
+    "smart_quotes": TEXT.replace('"Lima"', "“Lima”"),
+    "truncated": TEXT[:TEXT.rindex('"relevance"')].rstrip().rstrip(","),
+    "raw_newline_in_string": TEXT.replace("vía pública.", "vía\npública."),
+    "phone_with_separators": with_item("emergency_contacts", 0, phone_number="(01) 475-8888"),
+    "phone_as_number": with_item("key_contacts", 0, phone_number=991234567),
+    "invalid_optional_phone": with_item("help_centers", 0, contact_number="no disponible"),
+    "unfixable_item": with_item("emergency_contacts", 1, phone_number="llamar a la central"),
+}
+
+
+def fixed_reask(item):
+    async def reask(prompt):
+        return json.dumps(item, ensure_ascii=False)
+    return reask
+
+
+def baseline_parse(text):
+    """What the chains did before: JsonOutputParser, then the schema, regenerating on any failure."""
+    try:
+        SecurityPlanDataCollection(**JsonOutputParser().parse(text))
+        return True
+    except (OutputParserException, ValidationError, TypeError):
+        return False
+
+
+def test_repair_json_handles_truncated_output():
+    assert repair_json('{"a": [1, 2, {"b": "c') == {"a": [1, 2, {"b": "c"}]}
+
+
+@pytest.mark.parametrize("name", sorted(MALFORMED))
+def test_malformed_output_is_salvaged_without_regeneration(name):
+    validator = StructuredOutputValidator("test", SecurityPlanDataCollection, max_reasks=2, max_regenerations=1)
+    produced = 0
+
+    async def produce():
+        nonlocal produced
+        produced += 1
+        return MALFORMED[name]
+
+    reask = fixed_reask({"name": "Bomberos", "phone_number": "012225555", "description": None})
+    plan = asyncio.run(validator.generate(produce, reask))
+
+    assert produced == 1
+    assert validator.regenerations == 0
+    assert plan["district"] == "Miraflores"
+    assert len(plan["emergency_contacts"]) == 2
+    assert validator.item_reasks == (1 if name == "unfixable_item" else 0)
+
+
+def test_corpus_avoids_full_regenerations():
+    validator = StructuredOutputValidator("test", SecurityPlanDataCollection, max_reasks=2, max_regenerations=1)
+    reask = fixed_reask({"name": "Bomberos", "phone_number": "012225555", "description": None})
+
+    async def run():
+        for text in MALFORMED.values():
+            await validator.generate(lambda text=text: asyncio.sleep(0, text), reask)
+
+    asyncio.run(run())
+    baseline_regenerations = sum(not baseline_parse(text) for text in MALFORMED.values())
+    stats = validator.stats()
+
+    # Most of the corpus forced a full regeneration before
+    assert baseline_regenerations >= len(MALFORMED) // 2
+    assert stats["regenerations"] == 0
+    assert stats["failures"] == 0
+    assert stats["outputs"] == len(MALFORMED)
+    assert stats["repair_rate"] == 1.0
+    assert stats["item_reasks"] == 1
+
+
+def test_item_that_cannot_be_repaired_is_dropped():
+    validator = StructuredOutputValidator("test", SecurityPlanDataCollection, max_reasks=1, max_regenerations=0)
+
+    async def reask(prompt):
+        return "no sé"
+
+    plan = asyncio.run(validator.parse_and_validate(MALFORMED["unfixable_item"], reask))
+
+    assert [contact["name"] for contact in plan["emergency_contacts"]] == ["Policía"]
+    assert validator.stats()["item_reask_failures"] == 1
+    assert validator.stats()["dropped_items"] == 1
+
+
+def test_unusable_output_is_regenerated_then_rejected():
+    validator = StructuredOutputValidator("test", SecurityPlanDataCollection, max_reasks=1, max_regenerations=1)
+    outputs = iter(["Lo siento, no encontré información.", "Sigo sin información."])
+
+    async def produce():
+        return next(outputs)
+
+    with pytest.raises(StructuredOutputError):
+        asyncio.run(validator.generate(produce))
+    assert validator.regenerations == 1
+    assert validator.failures == 2
@@ -0,0 +1,113 @@
+"""
+Runs against a real ArangoDB, e.g. the one in docker-compose.yml:
+
+    ARANGODB_TEST_DATABASE=_system ARANGODB_USERNAME=root ARANGODB_PASSWORD=password pytest tests/test_user_lookups.py
+
+Skipped unless ARANGODB_TEST_DATABASE is set. Seeds throwaway users up to
+each size in USER_LOOKUP_SIZES (10k and 100k by default, add 1000000 for
+the full run) and removes them afterwards.
+"""
+import asyncio
+import os
+import time
+import uuid
+
+import pytest
+
+from app.api.db.connection import ArangoConnectionManager
+from app.api.db.repositories import UserRepository
+from app.api.db.schema import ensure_schema
+
+pytestmark = pytest.mark.skipif(
+    not os.getenv("ARANGODB_TEST_DATABASE"), reason="ARANGODB_TEST_DATABASE is not set"
+)
+
+SIZES = [int(size) for size in os.getenv("USER_LOOKUP_SIZES", "10000,100000").split(",")]
+LOOKUPS = 200
+BATCH = 10_000
+
+
+@pytest.fixture
+def manager():
+    manager = ArangoConnectionManager(database=os.environ["ARANGODB_TEST_DATABASE"])
+    ensure_schema(manager.db)
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def prefix(manager):
+    prefix = f"test-{uuid.uuid4().hex[:8]}"
+    yield prefix
+    manager.db.aql.execute(
+        "FOR user IN users FILTER STARTS_WITH(user.email, @prefix) REMOVE user IN users",
+        bind_vars={"prefix": prefix},
+    )
+
+
+def user(prefix, index):
+    return {
+        "email": f"{prefix}-{index}@example.com",
+        "dni": f"{prefix}-{index}",
+        "password": "x",
+        "firstName": "Prueba",
+        "lastName": "Prueba",
+        "department": "Lima",
+        "province": "Lima",
+        "district": "Miraflores",
+        "ipSignup": "127.0.0.1",
+    }
+
+
+def seed(manager, prefix, start, stop):
+    for first in range(start, stop, BATCH):
+        manager.db.collection("users").import_bulk(
+            [user(prefix, index) for index in range(first, min(first + BATCH, stop))], on_duplicate="error"
+        )
+
+
+def mean_latency(lookup, count) -> float:
+    async def main():
+        started = time.perf_counter()
+        for index in range(LOOKUPS):
+            await lookup(index * (count // LOOKUPS))
+        return (time.perf_counter() - started) / LOOKUPS
+
+    return asyncio.run(main())
+
+
+def test_login_and_registration_lookups_stay_flat_as_users_grow(manager, prefix):
+    users = UserRepository(manager)
+    latencies = {}
+    seeded = 0
+    for size in SIZES:
+        seed(manager, prefix, seeded, size)
+        seeded = size
+        latencies[size] = {
+            "find_by_email": mean_latency(lambda index: users.find_by_email(f"{prefix}-{index}@example.com"), size),
+            "find_duplicate": mean_latency(lambda index: users.find_duplicate(f"{prefix}-x{index}@example.com", f"{prefix}-x{index}"), size),
+        }
+
+    smallest, largest = latencies[SIZES[0]], latencies[SIZES[-1]]
+    for lookup in ("find_by_email", "find_duplicate"):
+        # An index lookup is flat; a collection scan grows with the number of users
+        assert largest[lookup] < 3 * smallest[lookup] + 0.002, f"{lookup}: {latencies}"
+
+
+def test_lookups_find_the_seeded_users(manager, prefix):
+    seed(manager, prefix, 0, 10)
+    users = UserRepository(manager)
+
+    async def main():
+        return (
+            await users.find_by_email(f"{prefix}-3@example.com"),
+            await users.find_duplicate(f"{prefix}-3@example.com", f"{prefix}-nuevo"),
+            await users.find_duplicate(f"{prefix}-nuevo@example.com", f"{prefix}-4"),
+            await users.find_duplicate(f"{prefix}-nuevo@example.com", f"{prefix}-nuevo"),
+        )
+
+    found, by_email, by_dni, missing = asyncio.run(main())
+
+    assert found["email"] == f"{prefix}-3@example.com"
+    assert "dni" not in found
+    assert (by_email, by_dni, missing) == ("email", "dni", None)